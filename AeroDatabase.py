@@ -0,0 +1,266 @@
+"""
+Aerodynamic coefficient database of the campaign for the trajectory codes. The Data.table coefficients (CX-global,
+CZ-global, CMY-global, ...) of the postprocessed cases are collected over the far field (mach, alpha) once, saved to
+the small .npz file, and then interpolated for any number of query points at once:
+
+    python AeroDatabase.py specification/output.json aero.npz
+
+    database = AeroDatabase.load("aero.npz")
+    values = database.query(machs, alphas)                  # dictionary: coefficient -> array shaped as machs
+    cz = database.query(machs, alphas, "CZ-global")
+
+When the cases form a full Mach x alpha grid they are interpolated bilinearly. Scattered cases are interpolated
+linearly on their Delaunay triangulation (see ScatteredAeroDatabase, requires scipy), which is rebuilt from the saved
+points on load, the query points outside of the convex hull of the cases are NaN. The cases sharing the same
+(mach, alpha), e.g. of different meshes or solver settings, are refused with their names listed, --average averages
+them. The source can be the aggregated output.json or the Store directory (see Store.py).
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+
+import Parser
+import Store
+
+# Rounding of the (mach, alpha) coordinates, which makes 0.1 + 0.2 and 0.3 the same grid node
+DECIMALS = 9
+
+
+def tableRows(cases, componentName="Net"):
+    """
+    Returns (titles, rows, case names) of the Data.table of the cases (dictionary: case name -> DirectoryParser.data),
+    the cases without complete table are skipped
+    """
+    titles, rows, caseNames = None, [], []
+    for name in sorted(cases):
+        try:
+            titles, row = Parser.Data(cases[name]).table(componentName)
+        except Exception:
+            print "Skipping " + name + ", its table is incomplete"
+            continue
+        rows.append(row)
+        caseNames.append(name)
+    return titles, rows, caseNames
+
+
+def storeRows(store, componentName="Net"):
+    """
+    Same as tableRows for the Store, gathered by Store.table at once
+    """
+    table = store.table(zones=[componentName])
+    titles = ["mach", "alpha"] + [title for title, fileName, forceName, component in Store.TABLE_COLUMNS]
+    rows = np.column_stack([table[Parser.simpleKey(title)] for title in titles])
+    complete = ~np.isnan(rows).any(axis=1)
+    return titles, rows[complete], table["name"][complete].tolist()
+
+
+class AeroDatabase:
+    def __init__(self, mach, alpha, values, names):
+        """
+        mach, alpha: sorted grid axes, values: array of shape (mach, alpha, coefficients), names: the coefficients
+        """
+        self.mach = np.asarray(mach, dtype=np.float64)
+        self.alpha = np.asarray(alpha, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.names = list(names)
+        self.nameIds = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def build(cls, titles, rows, caseNames=None, average=False):
+        """
+        Builds the database of the table rows (mach, alpha, coefficients...) with the titles as from Data.table. The
+        cases sharing the (mach, alpha) raise the exception naming them (caseNames, the row numbers by default), unless
+        average=True.
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if len(rows) == 0:
+            raise Exception("No case with complete coefficient table")
+
+        machId, alphaId = titles.index("mach"), titles.index("alpha")
+        names = [title for title in titles if title not in ("mach", "alpha")]
+        columns = [titles.index(name) for name in names]
+
+        points = np.round(rows[:, [machId, alphaId]], DECIMALS) + 0.0  # + 0.0 turns -0.0 into 0.0
+        points, inverse = uniqueRows(points)
+        values = np.zeros((len(points), len(names)))
+        np.add.at(values, inverse, rows[:, columns])
+        counts = np.bincount(inverse, minlength=len(points))
+        values /= counts[:, np.newaxis]
+        if (counts > 1).any():
+            if not average:
+                if caseNames is None:
+                    caseNames = ["row %d" % i for i in range(len(rows))]
+                clashes = []
+                for i in np.nonzero(counts > 1)[0]:
+                    clashes.append("(%g, %g): " % tuple(points[i]) +
+                                   ", ".join(caseNames[j] for j in np.nonzero(inverse == i)[0]))
+                raise Exception("The cases share the (mach, alpha), select the cases or average them:\n    " +
+                                "\n    ".join(clashes))
+            print "%d (mach, alpha) points have more cases, their coefficients are averaged" % (counts > 1).sum()
+
+        mach, machIds = np.unique(points[:, 0], return_inverse=True)
+        alpha, alphaIds = np.unique(points[:, 1], return_inverse=True)
+        if len(points) < len(mach) * len(alpha):
+            return ScatteredAeroDatabase(points, values, names)
+
+        grid = np.empty((len(mach), len(alpha), len(names)))
+        grid[machIds, alphaIds] = values
+        return AeroDatabase(mach, alpha, grid, names)
+
+    def query(self, mach, alpha, names=None, clamp=False):
+        """
+        Interpolation at the points (mach, alpha), given as scalars or arrays of the same shape. Returns the array of
+        the single coefficient when names is a string, otherwise the dictionary: coefficient -> array. The points
+        outside of the database are NaN, unless clamp=True, which holds the values at the grid edge.
+        """
+        mach = np.asarray(mach, dtype=np.float64)
+        alpha = np.asarray(alpha, dtype=np.float64)
+        shape = np.broadcast(mach, alpha).shape
+        mach, alpha = np.broadcast_to(mach, shape).ravel(), np.broadcast_to(alpha, shape).ravel()
+
+        single = isinstance(names, basestring)
+        if names is None:
+            names = self.names
+        elif single:
+            names = [names]
+        result = self.interpolate(mach, alpha, [self.nameIds[name] for name in names], clamp)
+
+        if single:
+            return result[:, 0].reshape(shape)
+        return dict((name, result[:, k].reshape(shape)) for k, name in enumerate(names))
+
+    def interpolate(self, mach, alpha, columns, clamp):
+        """
+        Bilinear interpolation of the coefficient columns at the 1D arrays mach and alpha
+        """
+        values = self.values[:, :, columns]
+        i, t, machOutside = locate(self.mach, mach, clamp)
+        j, u, alphaOutside = locate(self.alpha, alpha, clamp)
+        i1 = np.minimum(i + 1, len(self.mach) - 1)
+        j1 = np.minimum(j + 1, len(self.alpha) - 1)
+        t, u = t[:, np.newaxis], u[:, np.newaxis]
+
+        result = (1 - t) * (1 - u) * values[i, j] + t * (1 - u) * values[i1, j] + \
+                 (1 - t) * u * values[i, j1] + t * u * values[i1, j1]
+        result[machOutside | alphaOutside] = np.nan
+        return result
+
+    def save(self, path):
+        np.savez(path, mach=self.mach, alpha=self.alpha, values=self.values, names=np.array(self.names))
+
+
+class ScatteredAeroDatabase(AeroDatabase):
+    def __init__(self, points, values, names):
+        """
+        points: unique (mach, alpha) of shape (n, 2), values: array of shape (n, coefficients), names: the coefficients
+        """
+        try:
+            from scipy.spatial import Delaunay
+        except ImportError:
+            raise Exception("The cases don't form the full Mach x alpha grid, interpolating them requires scipy")
+
+        self.points = np.asarray(points, dtype=np.float64)
+        # The unique Mach and alpha values, the ranges of the cases
+        AeroDatabase.__init__(self, np.unique(self.points[:, 0]), np.unique(self.points[:, 1]), values, names)
+
+        # The Mach and alpha ranges differ by an order of magnitude, the triangulation is done in the rescaled space
+        self.scale = np.array([np.ptp(self.mach), np.ptp(self.alpha)])
+        try:
+            self.triangulation = Delaunay(self.points / self.scale)
+        except Exception:
+            raise Exception("The %d (mach, alpha) points of the cases lie on one line, they can't be interpolated"
+                            % len(self.points))
+
+    def interpolate(self, mach, alpha, columns, clamp):
+        """
+        Linear interpolation of the coefficient columns at the 1D arrays mach and alpha by the barycentric weights of
+        the Delaunay triangles. With clamp=True the points are moved into the Mach and alpha ranges of the cases, the
+        points outside of their convex hull stay NaN.
+        """
+        if clamp:
+            mach = np.clip(mach, self.mach[0], self.mach[-1])
+            alpha = np.clip(alpha, self.alpha[0], self.alpha[-1])
+        queries = np.column_stack([mach, alpha]) / self.scale
+
+        simplices = self.triangulation.find_simplex(queries)
+        inside = simplices >= 0
+        transform = self.triangulation.transform[simplices[inside]]
+        weights = np.einsum("ijk,ik->ij", transform[:, :2], queries[inside] - transform[:, 2])
+        weights = np.column_stack([weights, 1 - weights.sum(axis=1)])
+
+        values = self.values[:, columns]
+        result = np.empty((len(queries), len(columns)))
+        result[:] = np.nan
+        result[inside] = np.einsum("ij,ijk->ik", weights, values[self.triangulation.simplices[simplices[inside]]])
+        return result
+
+    def save(self, path):
+        np.savez(path, points=self.points, values=self.values, names=np.array(self.names))
+
+
+def uniqueRows(points):
+    """
+    Returns the unique rows of the (n, 2) array and the indices, which rebuild the points from them
+    """
+    order = np.lexsort((points[:, 1], points[:, 0]))
+    sortedPoints = points[order]
+    first = np.ones(len(points), dtype=bool)
+    first[1:] = (sortedPoints[1:] != sortedPoints[:-1]).any(axis=1)
+    inverse = np.empty(len(points), dtype=np.intp)
+    inverse[order] = np.cumsum(first) - 1
+    return sortedPoints[first], inverse
+
+
+def locate(axis, x, clamp):
+    """
+    Returns (lower node index, weight of the upper node, outside mask) of the values x on the sorted axis
+    """
+    if len(axis) == 1:
+        zeros = np.zeros(len(x), dtype=np.intp)
+        return zeros, np.zeros(len(x)), ~np.isclose(x, axis[0]) & (not clamp)
+
+    i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+    t = (x - axis[i]) / (axis[i + 1] - axis[i])
+    if clamp:
+        return i, np.clip(t, 0.0, 1.0), np.zeros(len(x), dtype=bool)
+    return i, t, (x < axis[0]) | (x > axis[-1]) | np.isnan(x)
+
+
+def load(path):
+    with np.load(path) as data:
+        if "points" in data:
+            return ScatteredAeroDatabase(data["points"], data["values"], data["names"].tolist())
+        return AeroDatabase(data["mach"], data["alpha"], data["values"], data["names"].tolist())
+
+
+def buildFrom(source, componentName="Net", average=False):
+    """
+    Builds the database from the aggregated output.json or the Store directory
+    """
+    if os.path.isdir(source):
+        titles, rows, caseNames = storeRows(Store.Store(source), componentName)
+    else:
+        with open(source, "r") as fptr:
+            titles, rows, caseNames = tableRows(json.load(fptr), componentName)
+    return AeroDatabase.build(titles, rows, caseNames, average)
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Build the interpolated aerodynamic coefficient database")
+    argParser.add_argument("source", help="aggregated output.json or the Store directory of the campaign")
+    argParser.add_argument("output", help="output .npz file")
+    argParser.add_argument("--component", default="Net", help="zone of the coefficients, Net by default")
+    argParser.add_argument("--average", action="store_true",
+                           help="average the cases sharing the (mach, alpha) instead of refusing them")
+    args = argParser.parse_args()
+
+    database = buildFrom(args.source, args.component, args.average)
+    database.save(args.output)
+    if isinstance(database, ScatteredAeroDatabase):
+        print "%d scattered (mach, alpha) points of %d coefficients saved to %s" \
+              % (len(database.points), len(database.names), args.output)
+    else:
+        print "%d Mach x %d alpha grid of %d coefficients saved to %s" \
+              % (len(database.mach), len(database.alpha), len(database.names), args.output)
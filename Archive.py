@@ -0,0 +1,127 @@
+"""
+Postprocessing of the case directories packed in tar (plain, .gz, .bz2, .xz) or zip archives, without extracting
+them. The archive is read in one sequential pass, its members are grouped by the directory and each member which is
+one of Parser.FILES (also compressed, e.g. FX.gz) is streamed straight to its parser. The case is yielded as soon as
+all of its files were parsed, so for the usual archives, where the files of a case are stored together, only one case
+is held in memory:
+
+    for parser in loadArchiveCases("batch_1.tar.gz"):
+        print parser.directory, parser.data["Log"]["nIteration"]
+
+The directory of the case is the virtual path "<archive>/<member directory>", so os.path.basename of it is the case
+directory name.
+"""
+
+import os
+import bz2
+import zlib
+import tarfile
+import zipfile
+
+import Parser
+
+ARCHIVE_EXTENSIONS = [".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz", ".zip"]
+
+
+def isArchive(path):
+    return os.path.isfile(path) and any(path.endswith(extension) for extension in ARCHIVE_EXTENSIONS)
+
+
+def archiveMembers(path):
+    """
+    Generator of (member name, file object) of the regular files in the archive order. The file object is valid only
+    until the next member is requested, the tar archives are read as the stream.
+    """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.filename.endswith("/"):
+                    member = archive.open(info)
+                    yield info.filename, member
+                    member.close()
+        return
+
+    archive = tarfile.open(path, "r|*")
+    try:
+        for info in archive:
+            if info.isfile():
+                yield info.name, archive.extractfile(info)
+    finally:
+        archive.close()
+
+
+def decompressedLines(fptr, extension, chunkSize=1 << 20):
+    """
+    Generator of the lines of the compressed member, decompressed chunk by chunk, as the archive streams can't seek
+    """
+    if extension == ".gz":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif extension == ".bz2":
+        decompressor = bz2.BZ2Decompressor()
+    elif Parser.lzma is not None:
+        decompressor = Parser.lzma.LZMADecompressor()
+    else:
+        raise Exception("The member is compressed with xz, which requires the lzma module (backports.lzma in Python 2)")
+
+    partialLine = ""
+    for chunk in iter(lambda: fptr.read(chunkSize), b""):
+        lines = (partialLine + decompressor.decompress(chunk)).split("\n")
+        partialLine = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if partialLine:
+        yield partialLine
+
+
+def caseFile(memberName):
+    """
+    Returns (member directory, Parser.FILES name, compression extension or None) of the case file, None for other
+    members
+    """
+    directory, fileName = os.path.split(memberName)
+
+    extension = os.path.splitext(fileName)[1]
+    if extension in Parser.COMPRESSED_EXTENSIONS:
+        fileName = fileName[:-len(extension)]
+    else:
+        extension = None
+
+    for name in Parser.FILES:
+        if Parser.FILES[name] == fileName:
+            return directory, name, extension
+    return None
+
+
+def loadArchiveCases(path):
+    """
+    Generator of Parser.DirectoryParser objects with the data and errors of the cases found in the archive
+    """
+    pending = dict()
+    parsed = dict()
+
+    for memberName, fptr in archiveMembers(path):
+        found = caseFile(memberName)
+        if found is None:
+            continue
+        directory, name, extension = found
+
+        label = path + os.sep + memberName
+        lines = fptr if extension is None else decompressedLines(fptr, extension)
+
+        if directory not in pending:
+            pending[directory] = Parser.DirectoryParser(os.path.join(path, directory))
+            parsed[directory] = set()
+        parser = pending[directory]
+
+        parser.collect([Parser.runParser(name, Parser.createParser(name, label), lines)])
+        parsed[directory].add(name)
+
+        if len(parsed[directory]) == len(Parser.FILES):
+            print "Accepting " + parser.directory
+            del pending[directory]
+            del parsed[directory]
+            yield parser
+
+    for directory in sorted(pending):
+        print "WARNING! omitting directory " + pending[directory].directory + \
+              " because there are missing files for proper postprocessing"
@@ -0,0 +1,136 @@
+"""
+Per case manifest cache used for incremental postprocessing. The manifest (.manifest.json) is stored in the case
+directory and holds the size, modification time and optionally the SHA1 hash of each file from Parser.FILES together
+with the parsed data. The version and the input states are repeated in the small sidecar (.manifest.states.json),
+so the validity is checked without decoding the data. When none of the input files changed and the manifest was
+written by the same Parser.PARSER_VERSION, the case is served from the manifest instead of being parsed again:
+
+    cache = CaseCache(directory)
+    cached = cache.load()
+    if cached is None:
+        parser = Parser.DirectoryParser(directory)
+        parser.load()
+        cache.store(parser.data, parser.errors)
+"""
+
+import os
+import json
+import hashlib
+
+import Parser
+
+MANIFEST = ".manifest.json"
+
+STATES = ".manifest.states.json"
+
+
+def fileState(path, useHash=False):
+    stat = os.stat(path)
+    state = {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    if useHash:
+        sha = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        state["sha1"] = sha.hexdigest()
+
+    return state
+
+
+class CaseCache:
+    def __init__(self, directory, useHash=False):
+        self.directory = directory
+        self.path = directory + os.sep + MANIFEST
+        self.statesPath = directory + os.sep + STATES
+        self.useHash = useHash
+
+    def inputStates(self):
+        states = dict()
+        for name in Parser.FILES:
+            path = Parser.resolvePath(self.directory + os.sep + Parser.FILES[name])
+            if os.path.exists(path):
+                states[name] = fileState(path, self.useHash)
+            else:
+                states[name] = None
+        return states
+
+    def statesFrom(self, contents):
+        """
+        Input states of the files already read into memory by the Parser.Prefetcher, the hash is computed from the read
+        bytes, so the files are not read again
+        """
+        states = dict()
+        for name in Parser.FILES:
+            content = contents.get(name)
+            if content is None:
+                states[name] = None
+                continue
+
+            path, stat, data = content
+            states[name] = {"size": stat.st_size, "mtime": stat.st_mtime}
+            if self.useHash:
+                states[name]["sha1"] = hashlib.sha1(data).hexdigest()
+        return states
+
+    def isValid(self):
+        """
+        True when the manifest was written by the same parser version and no input file changed since. Reads only
+        the sidecar with the input states, not the cached data.
+        """
+        try:
+            with open(self.statesPath, "r") as fptr:
+                header = json.load(fptr)
+        except (IOError, ValueError):
+            return False
+
+        if header.get("version") != Parser.PARSER_VERSION:
+            return False
+
+        files = header.get("files") or dict()
+        if not self.useHash:
+            # Manifest written with hashes stays valid when only size and modification time are checked
+            for state in files.values():
+                if state is not None:
+                    state.pop("sha1", None)
+
+        return files == self.inputStates()
+
+    def load(self):
+        """
+        Returns cached (data, errors) or None when the manifest is missing, outdated or any input file changed. The force
+        reports of the data are ForceReport objects, the same as from the parsers.
+        """
+        if not self.isValid():
+            return None
+
+        try:
+            with open(self.path, "r") as fptr:
+                manifest = json.load(fptr)
+        except (IOError, ValueError):
+            return None
+
+        return Parser.compactData(manifest["data"]), manifest["errors"]
+
+    def store(self, data, errors, states=None):
+        """
+        Writes the manifest. The input states should be taken before parsing, so the files modified in the meantime
+        are parsed again on the next run.
+        """
+        header = {"version": Parser.PARSER_VERSION,
+                  "files": states if states is not None else self.inputStates()}
+        manifest = dict(header, data=data, errors=errors)
+
+        # The sidecar is removed first and written last, so the interrupted run never leaves the sidecar validating
+        # an older manifest behind
+        if os.path.exists(self.statesPath):
+            os.remove(self.statesPath)
+        self.write(self.path, manifest)
+        self.write(self.statesPath, header)
+
+    def write(self, path, value):
+        # Write to temporary file first, so the interrupted run never leaves broken file behind
+        tmpPath = path + ".tmp"
+        with open(tmpPath, "w") as fptr:
+            json.dump(value, fptr, default=Parser.plainData)
+        os.rename(tmpPath, path)
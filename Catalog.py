@@ -0,0 +1,209 @@
+"""
+SQLite catalog of the postprocessed campaign, built next to the aggregated output.json. Every case is one row of the
+cases table with its caseName, far field conditions (mach, alpha, static_pressure, temperature), nIteration and
+the Data.table coefficients, the final residuals are kept in the indexed residuals table. The cases can be filtered
+without loading the JSON data:
+
+    catalog = Catalog("catalog.sqlite")
+    for case in catalog.query(mach=(2, 3), alpha=10, residuals={"continuity": (None, 1e-3)}):
+        print case["name"], case["CX_global"]
+
+The conditions are single values (compared with the tolerance) or (min, max) ranges, None means the open bound. The
+unknown column and residual names raise the exception, so a typo never turns into the filter matching nothing.
+The coefficient columns are named as Data attributes, e.g. "CX-global" -> "CX_global". From the command line:
+
+    python Catalog.py specification/catalog.sqlite mach=2:3 alpha=10 continuity=:1e-3
+"""
+
+import sys
+import sqlite3
+from collections import OrderedDict
+
+import Parser
+
+CATALOG = "catalog.sqlite"
+
+CASE_FIELDS = [("name", "TEXT UNIQUE NOT NULL"),
+               ("caseName", "TEXT"),
+               ("mach", "REAL"),
+               ("alpha", "REAL"),
+               ("static_pressure", "REAL"),
+               ("temperature", "REAL"),
+               ("nIteration", "INTEGER")]
+
+INDEXED_FIELDS = ["caseName", "mach", "alpha"]
+
+
+def condition(column, value, tolerance):
+    """
+    Returns (SQL expression, parameters) of single query condition
+    """
+    if isinstance(value, (tuple, list)):
+        low, high = value
+        expressions, parameters = [], []
+        if low is not None:
+            expressions.append(column + " >= ?")
+            parameters.append(low)
+        if high is not None:
+            expressions.append(column + " <= ?")
+            parameters.append(high)
+        return " AND ".join(expressions) or "1", parameters
+
+    if isinstance(value, float) or isinstance(value, int) and not isinstance(value, bool):
+        return column + " BETWEEN ? AND ?", [value - tolerance, value + tolerance]
+
+    return column + " = ?", [value]
+
+
+class Catalog:
+    def __init__(self, path=CATALOG):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+
+        self.connection.execute("CREATE TABLE IF NOT EXISTS cases (id INTEGER PRIMARY KEY, " +
+                                ", ".join(name + " " + sqlType for name, sqlType in CASE_FIELDS) + ")")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS residuals "
+                                "(caseId INTEGER NOT NULL, name TEXT NOT NULL, value REAL)")
+        for name in INDEXED_FIELDS:
+            self.connection.execute("CREATE INDEX IF NOT EXISTS cases_%s ON cases (%s)" % (name, name))
+        self.connection.execute("CREATE INDEX IF NOT EXISTS residuals_name_value ON residuals (name, value)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS residuals_case ON residuals (caseId)")
+
+        self.columns = [row[1] for row in self.connection.execute("PRAGMA table_info(cases)")]
+
+    def addColumns(self, names):
+        for name in names:
+            if name not in self.columns:
+                self.connection.execute("ALTER TABLE cases ADD COLUMN %s REAL" % name)
+                self.columns.append(name)
+
+    def add(self, name, data):
+        """
+        Adds or replaces the case, data is the DirectoryParser.data dictionary. Call commit() to save the changes.
+        """
+        log = data.get("Log", dict())
+        farField = log.get("farFieldConditions", dict())
+
+        values = OrderedDict()
+        values["name"] = name
+        values["caseName"] = log.get("caseName")
+        for field in ["mach", "alpha", "static_pressure", "temperature"]:
+            values[field] = farField.get(field)
+        values["nIteration"] = log.get("nIteration")
+
+        try:
+            titles, row = Parser.Data(data).table("Net")
+        except Exception:
+            # Incomplete case, only the log values are cataloged
+            titles, row = [], []
+        for title, value in zip(titles, row):
+            if title not in values:
+                values[Parser.simpleKey(title)] = value
+        self.addColumns(values)
+
+        self.remove(name)
+        cursor = self.connection.execute("INSERT INTO cases (%s) VALUES (%s)"
+                                         % (", ".join(values), ", ".join("?" * len(values))), values.values())
+        self.connection.executemany("INSERT INTO residuals (caseId, name, value) VALUES (?, ?, ?)",
+                                    [(cursor.lastrowid, residual, value)
+                                     for residual, value in log.get("residuals", dict()).items()])
+
+    def remove(self, name):
+        self.connection.execute("DELETE FROM residuals WHERE caseId IN (SELECT id FROM cases WHERE name = ?)", (name,))
+        self.connection.execute("DELETE FROM cases WHERE name = ?", (name,))
+
+    def build(self, cases):
+        """
+        Adds all cases of the dictionary: case name -> DirectoryParser.data, e.g. loaded from output.json
+        """
+        for name in cases:
+            self.add(name, cases[name])
+        self.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def query(self, residuals=None, tolerance=1e-9, **conditions):
+        """
+        Returns the list of cases (dictionaries: column -> value) meeting all conditions, e.g.
+        query(mach=(2, 3), alpha=10, residuals={"continuity": (None, 1e-3)})
+        """
+        expressions, parameters = [], []
+        for column in sorted(conditions):
+            if column not in self.columns:
+                raise Exception("Unknown catalog column " + column + ", available: " + ", ".join(self.columns))
+            expression, values = condition(column, conditions[column], tolerance)
+            expressions.append(expression)
+            parameters += values
+
+        residualNames = self.residualNames() if residuals else []
+        for name in sorted(residuals or dict()):
+            if name not in residualNames:
+                raise Exception("Unknown residual " + name + ", available: " + ", ".join(residualNames))
+            expression, values = condition("value", residuals[name], tolerance)
+            expressions.append("id IN (SELECT caseId FROM residuals WHERE name = ? AND %s)" % expression)
+            parameters += [name] + values
+
+        sql = "SELECT * FROM cases"
+        if expressions:
+            sql += " WHERE " + " AND ".join(expressions)
+        cursor = self.connection.execute(sql + " ORDER BY name", parameters)
+
+        names = [description[0] for description in cursor.description]
+        return [OrderedDict(zip(names, row)) for row in cursor]
+
+    def residualNames(self):
+        """
+        Sorted names of the residuals of all cases
+        """
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT name FROM residuals ORDER BY name")]
+
+    def residuals(self, name):
+        """
+        Final residuals of the case as a dictionary
+        """
+        return dict(self.connection.execute("SELECT residuals.name, value FROM residuals JOIN cases "
+                                            "ON residuals.caseId = cases.id WHERE cases.name = ?", (name,)))
+
+
+def parseArgument(argument):
+    """
+    "mach=2:3" -> ("mach", (2.0, 3.0)), "continuity=:1e-3" -> ("continuity", (None, 0.001)), "alpha=10" -> ("alpha", 10.0)
+    """
+    name, value = argument.split("=", 1)
+    if ":" in value:
+        return name, tuple(float(bound) if bound else None for bound in value.split(":", 1))
+    try:
+        return name, float(value)
+    except ValueError:
+        return name, value
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print "usage: python Catalog.py catalog.sqlite [column=value | column=min:max | residual=min:max ...]"
+        sys.exit(1)
+
+    catalog = Catalog(sys.argv[1])
+    conditions, residuals = dict(), dict()
+    residualNames = catalog.residualNames()
+    for argument in sys.argv[2:]:
+        name, value = parseArgument(argument)
+        if name in catalog.columns:
+            conditions[name] = value
+        elif name in residualNames:
+            residuals[name] = value
+        else:
+            raise Exception("Unknown column or residual " + name + ", columns: " + ", ".join(catalog.columns) +
+                            ", residuals: " + ", ".join(residualNames))
+
+    cases = catalog.query(residuals, **conditions)
+    if cases:
+        columns = [column for column in cases[0] if column != "id"]
+        print ",".join(columns)
+        for case in cases:
+            print ",".join(str(case[column]) for column in columns)
@@ -0,0 +1,284 @@
+"""
+Sidecar byte offset index of the Fluent log. The log is scanned once and the index (.fluent_log.log.index.json, next
+to the log) keeps the byte offsets and line numbers of every "> command" echo with the extent of its output, and of
+every residual block (header with the rows below it) with the range of iterations it covers. The iteration counter
+goes back in the batch transcripts with more cases, after the initialization or the data file read, so the blocks
+are split into the runs of increasing iterations, which are searched one by one. The index is valid as long as the
+log size and modification time match, later reads go straight to the wanted bytes through mmap:
+
+    index = LogIndex("case_1/fluent_log.log")
+    history = index.residuals(4000, 5000)                   # Parser.ResidualHistory of the iterations 4000-5000
+    print index.section("pressure-far-field")               # the command echo with its output
+    for offset, line, end, command in index.commands("/report/forces"):
+        print line, command
+
+The index of the log which is still growing is built again on the next use.
+"""
+
+import os
+import sys
+import json
+import mmap
+import bisect
+import argparse
+
+import Parser
+
+INDEX_VERSION = 2
+
+
+def indexPath(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, "." + name + ".index.json")
+
+
+def buildIndex(path):
+    """
+    Scans the log once and returns the index dictionary
+    """
+    commands = {"offset": [], "line": [], "end": [], "text": []}
+    blocks = {"offset": [], "line": [], "end": [], "first": [], "last": [], "header": []}
+    headers = []
+
+    def appendBlock(offset, lineNumber, end, header):
+        blocks["offset"].append(offset)
+        blocks["line"].append(lineNumber)
+        blocks["end"].append(end)
+        blocks["first"].append(None)
+        blocks["last"].append(None)
+        blocks["header"].append(header)
+
+    names = None
+    offset = 0
+    lineNumber = 0
+    with open(path, "rb") as fptr:
+        for line in fptr:
+            lineNumber += 1
+            lineOffset = offset
+            offset += len(line)
+
+            if line.startswith(">"):
+                if commands["offset"]:
+                    commands["end"][-1] = lineOffset
+                commands["offset"].append(lineOffset)
+                commands["line"].append(lineNumber)
+                commands["end"].append(None)
+                commands["text"].append(line[1:].strip())
+                names = None
+                continue
+
+            tokens = line.split()
+            if not tokens:
+                continue
+
+            if tokens[0] == "iter":
+                names = tokens[:-1]
+                if names not in headers:
+                    headers.append(names)
+                appendBlock(lineOffset, lineNumber, offset, headers.index(names))
+                continue
+
+            # Residual row: iter, residuals..., time, iterations left
+            if names is not None and len(tokens) == len(names) + 2 and tokens[0].isdigit():
+                iteration = int(tokens[0])
+                if blocks["last"][-1] is not None and iteration <= blocks["last"][-1]:
+                    # The counter went back without the new header, the block starts again at this row
+                    appendBlock(lineOffset, lineNumber, offset, blocks["header"][-1])
+                if blocks["first"][-1] is None:
+                    blocks["first"][-1] = iteration
+                blocks["last"][-1] = iteration
+                blocks["end"][-1] = offset
+
+    if commands["offset"]:
+        commands["end"][-1] = offset
+
+    # Headers not followed by any row (e.g. interrupted run) are useless for the iteration lookups
+    keep = [i for i, first in enumerate(blocks["first"]) if first is not None]
+    for key in blocks:
+        blocks[key] = [blocks[key][i] for i in keep]
+
+    # First blocks of the runs of increasing iterations
+    runs = [i for i in range(len(blocks["first"])) if i == 0 or blocks["first"][i] <= blocks["last"][i - 1]]
+
+    stat = os.stat(path)
+    return {"version": INDEX_VERSION,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "lines": lineNumber,
+            "commands": commands,
+            "headers": headers,
+            "blocks": blocks,
+            "runs": runs}
+
+
+class LogIndex:
+    def __init__(self, path, save=True):
+        self.path = path
+        self.index = self.load()
+
+        if self.index is None:
+            self.index = buildIndex(path)
+            if save:
+                self.save()
+
+        self.commandOffsets = self.index["commands"]["offset"]
+        self.blockLast = self.index["blocks"]["last"]
+        self.runs = zip(self.index["runs"], self.index["runs"][1:] + [len(self.blockLast)])
+
+    def load(self):
+        """
+        Returns the stored index or None when it is missing or outdated
+        """
+        try:
+            with open(indexPath(self.path), "r") as fptr:
+                index = json.load(fptr)
+        except (IOError, ValueError):
+            return None
+
+        stat = os.stat(self.path)
+        if index.get("version") != INDEX_VERSION or index.get("size") != stat.st_size or \
+                index.get("mtime") != stat.st_mtime:
+            return None
+
+        return index
+
+    def save(self):
+        # Write to temporary file first, so the interrupted run never leaves broken index behind
+        tmpPath = indexPath(self.path) + ".tmp"
+        try:
+            with open(tmpPath, "w") as fptr:
+                json.dump(self.index, fptr)
+            os.rename(tmpPath, indexPath(self.path))
+        except (IOError, OSError):
+            # Read only campaign directory, the index is kept only in memory
+            pass
+
+    def read(self, start, end):
+        """
+        Returns the bytes [start, end) of the log
+        """
+        if end <= start:
+            return ""
+        with open(self.path, "rb") as fptr:
+            if os.fstat(fptr.fileno()).st_size == 0:
+                # The log just created, empty file can't be mapped
+                return ""
+            data = mmap.mmap(fptr.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return data[start:end]
+            finally:
+                data.close()
+
+    def commands(self, pattern=None):
+        """
+        Returns the list of (offset, line number, end offset, command text) of the commands containing the pattern
+        """
+        commands = self.index["commands"]
+        return [(commands["offset"][i], commands["line"][i], commands["end"][i], commands["text"][i])
+                for i in range(len(commands["offset"]))
+                if pattern is None or pattern in commands["text"][i]]
+
+    def section(self, pattern, occurrence=0):
+        """
+        Returns the text of the command containing the pattern together with its output, None when not found
+        """
+        commands = self.commands(pattern)
+        if len(commands) <= occurrence:
+            return None
+        offset, line, end, text = commands[occurrence]
+        return self.read(offset, end)
+
+    def command(self, offset):
+        """
+        Returns the command text which output holds the byte offset, None before the first command
+        """
+        i = bisect.bisect_right(self.commandOffsets, offset) - 1
+        if i < 0:
+            return None
+        return self.index["commands"]["text"][i]
+
+    def blocks(self, first, last):
+        """
+        Indices of the residual blocks covering any of the iterations first-last, in the log order
+        """
+        blocks = self.index["blocks"]
+        selected = []
+        for runStart, runEnd in self.runs:
+            # The blocks of the run are ordered by the iterations, the first candidate is the first block ending at
+            # or after first
+            i = bisect.bisect_left(self.blockLast, first, runStart, runEnd)
+            while i < runEnd and blocks["first"][i] <= last:
+                selected.append(i)
+                i += 1
+        return selected
+
+    def spans(self, selected):
+        """
+        Byte ranges (start, end) of the selected blocks, the consecutive blocks of the same run are read at once
+        """
+        blocks = self.index["blocks"]
+        runStarts = set(self.index["runs"])
+        spans = []
+        for k, i in enumerate(selected):
+            if k > 0 and i == selected[k - 1] + 1 and i not in runStarts:
+                spans[-1][1] = blocks["end"][i]
+            else:
+                spans.append([blocks["offset"][i], blocks["end"][i]])
+        return spans
+
+    def residuals(self, first, last):
+        """
+        Returns Parser.ResidualHistory with the residual rows of the iterations first-last (inclusive), in the log
+        order. The iterations repeated after the counter went back are returned as many times as they are in the log.
+        """
+        blocks = self.index["blocks"]
+        selected = self.blocks(first, last)
+        if not selected:
+            raise Exception("The iterations " + str(first) + "-" + str(last) + " are not in the log " + self.path)
+
+        names = self.index["headers"][blocks["header"][selected[0]]]
+        history = Parser.ResidualHistory(names, last - first + 1)
+        text = "".join(self.read(start, end) for start, end in self.spans(selected))
+
+        for line in text.splitlines():
+            tokens = line.split()
+            if len(tokens) != len(names) + 2 or not tokens[0].isdigit():
+                continue
+            iteration = int(tokens[0])
+            if first <= iteration <= last:
+                history.append(map(float, tokens[:len(names)]))
+
+        return history
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Query the Fluent log through its sidecar index")
+    argParser.add_argument("log", help="Fluent log, or case directory with the " + Parser.FILES["Log"])
+    argParser.add_argument("--iterations", type=int, nargs=2, metavar=("FIRST", "LAST"),
+                           help="print the residuals of the iterations FIRST-LAST")
+    argParser.add_argument("--section", metavar="PATTERN", help="print the output of the command matching PATTERN")
+    argParser.add_argument("--commands", nargs="?", const="", metavar="PATTERN",
+                           help="list the commands, optionally only those matching PATTERN")
+    args = argParser.parse_args()
+
+    path = args.log
+    if os.path.isdir(path):
+        path = os.path.join(path, Parser.FILES["Log"])
+    index = LogIndex(path)
+
+    if args.commands is not None:
+        for offset, line, end, command in index.commands(args.commands or None):
+            print "%8d %12d %s" % (line, offset, command)
+
+    if args.section:
+        section = index.section(args.section)
+        if section is None:
+            print "Command matching " + args.section + " not found"
+            sys.exit(1)
+        sys.stdout.write(section)
+
+    if args.iterations:
+        history = index.residuals(*args.iterations)
+        print " ".join(history.names)
+        for row in history.array:
+            print " ".join("%g" % value for value in row)
@@ -1,9 +1,26 @@
 #! /usr/bin/python
 
+import io
 import os
 import re
+import bz2
+import gzip
+import zlib
 import json
+import time
+import collections
 import numpy as np
+from multiprocessing.pool import ThreadPool
+
+import Profiling
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
 
 """
 Program which converts the set of output Fluent files into single JSON data structure file. The JSON data file
@@ -123,8 +140,96 @@ Each file consist of own data members. It is possible to distinguish 2 type of f
 """
 
 
-def ropen(filename, buf_size=8192):
+COMPRESSED_EXTENSIONS = [".gz", ".bz2", ".xz"]
+
+
+def resolvePath(path):
+    """
+    Returns the path of the existing file: the path itself or its compressed version (path.gz, path.bz2, path.xz).
+    When none exists the path is returned, so the error names the expected file.
+    """
+    if os.path.exists(path):
+        return path
+    for extension in COMPRESSED_EXTENSIONS:
+        if os.path.exists(path + extension):
+            return path + extension
+    return path
+
+
+def isCompressed(path):
+    return os.path.splitext(path)[1] in COMPRESSED_EXTENSIONS
+
+
+def openInput(path):
+    """
+    Opens the file for reading, the compressed versions (see resolvePath) are decompressed as they are read
+    """
+    resolvedPath = resolvePath(path)
+    extension = os.path.splitext(resolvedPath)[1]
+
+    if extension == ".gz":
+        # GzipFile.readline is slow in Python 2, the buffered reader does the line splitting
+        fptr = io.BufferedReader(gzip.open(resolvedPath, "rb"))
+    elif extension == ".bz2":
+        fptr = bz2.BZ2File(resolvedPath, "r")
+    elif extension == ".xz":
+        if lzma is None:
+            raise Exception("The file " + resolvedPath + " is compressed with xz, which requires the lzma module "
+                            "(backports.lzma in Python 2)")
+        fptr = lzma.open(resolvedPath, "rb")
+    else:
+        fptr = open(resolvedPath, "r")
+
+    if Profiling.active is not None:
+        Profiling.countOpen(path)
+    return fptr
+
+
+def readInput(path):
+    """
+    Reads the whole file (or its compressed version) into memory. Returns (resolved path, os.stat taken before the
+    read, raw bytes), the bytes are decompressed by decompress().
+    """
+    start = time.time()
+    resolvedPath = resolvePath(path)
+    stat = os.stat(resolvedPath)
+    with open(resolvedPath, "rb") as fptr:
+        data = fptr.read()
+
+    if Profiling.active is not None:
+        Profiling.countOpen(path)
+        Profiling.addReadTime(path, time.time() - start, prefetched=True)
+    return resolvedPath, stat, data
+
+
+def decompress(path, data):
+    extension = os.path.splitext(path)[1]
+    if extension == ".gz":
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    if extension == ".bz2":
+        return bz2.decompress(data)
+    if extension == ".xz":
+        if lzma is None:
+            raise Exception("The file " + path + " is compressed with xz, which requires the lzma module "
+                            "(backports.lzma in Python 2)")
+        return lzma.decompress(data)
+    return data
+
+
+def ropen(filename, buf_size=8192, tail_lines=10000):
     """a generator that returns the lines of a file in reverse order"""
+    filename = resolvePath(filename)
+    if isCompressed(filename):
+        # Compressed streams can't seek from the end, only the last tail_lines lines are kept in the single forward
+        # pass and returned in reverse order
+        with openInput(filename) as fh:
+            tail = collections.deque((line.rstrip("\n") for line in fh), tail_lines)
+        while tail:
+            line = tail.pop()
+            if len(line):
+                yield line
+        return
+
     with open(filename) as fh:
         segment = None
         offset = 0
@@ -157,89 +262,268 @@ def ropen(filename, buf_size=8192):
             yield segment
 
 
+class ResidualHistory:
+    """
+    Growable 2D float array with one row per solver iteration. Columns are named after the residual header,
+    the first column is the iteration number, e.g. history["continuity"] or history.array[:, history.columns["Cd-1"]]
+    """
+    def __init__(self, names, capacity=1024):
+        self.names = list(names)
+        self.columns = {name: i for i, name in enumerate(self.names)}
+        self.values = np.empty((max(capacity, 1), len(self.names)))
+        self.size = 0
+
+    def reserve(self, capacity):
+        if capacity <= self.values.shape[0]:
+            return
+        grown = np.empty((capacity, len(self.names)))
+        grown[:self.size] = self.values[:self.size]
+        self.values = grown
+
+    def append(self, row):
+        if self.size == self.values.shape[0]:
+            self.reserve(2 * self.size)
+        self.values[self.size] = row
+        self.size += 1
+
+    @property
+    def array(self):
+        return self.values[:self.size]
+
+    def __getitem__(self, name):
+        return self.values[:self.size, self.columns[name]]
+
+    def __len__(self):
+        return self.size
+
+
 class LogParser:
-    def __init__(self, path):
+    """
+    Reads the Fluent log in a single forward pass. Each line is checked against the dispatch table of matchers
+    (self.matchers) and handed to the processor of the first match. Processors which need the following line set the
+    self.lineProcessor, similarly to the ForceParser. Only the last residual row is kept, unless the history is requested.
+    """
+    def __init__(self, path, history=False):
         self.path = path
         self.output = dict()
 
-    def parseCaseName(self):
-        line = ""
-        with open(self.path, "r") as f:
-            while line.isspace() or 0 == len(line):
-                line = f.readline()
+        self.history = history
+        self.residualHistory = None
+
+        # First not empty line holds the fluent command with the journal name, unless it is the batch transcript
+        self.lineProcessor = self.parseCaseName
 
+        self.matchers = [(re.compile(r'\s*\d+\s').match, self.parseResidualValues),
+                         (re.compile(r'\s*iter\s').match, self.parseResidualNames),
+                         (re.compile(r'>\s*/?solve/iterate\s+(\d+)').match, self.parseIterate),
+                         (re.compile(r'\(pressurefarfield\)').search, self.findMachAlphaBoundaryCondition)]
+
+        self.residualNames = None
+        self.residualValues = None
+        self.nIterationsRequested = 0
+
+    def parseCaseName(self, line):
         result = re.search(r'-i\s*([\w\s*]+)\.jou', line)
+        self.lineProcessor = None
+
         if not result:
-            raise Exception(
-                "The line: " + line[:-1] + "\ndoes not contain -i ....jou sentence required to obtain case name")
+            # Transcripts of the batch journals (see journalGenerator.py --batch) don't start with the fluent command,
+            # the case is named after the log directory then
+            self.output["caseName"] = os.path.basename(os.path.dirname(os.path.abspath(self.path)))
+            self.processLine(line)
+            return
 
         caseName = result.groups(0)[0]
 
         self.output["caseName"] = caseName
 
-    def parseMachAlphaBoundaryCondition(self):
-        # pressurefarfield no 89875. no 1.10 no 281.65 yes no -1. no 5e-5 no 0. no no yes 0.1 50.
+    def findMachAlphaBoundaryCondition(self, line, res):
+        if "farFieldConditions" not in self.output:
+            self.lineProcessor = self.parseMachAlphaBoundaryCondition
 
-        prevLine = re.compile(r'\(pressurefarfield\)')
-
-        found = False
-        with open(self.path, "r") as f:
-            for line in f.readlines():
-                if found:
-                    res = re.split(r'\s+', line.strip().replace("no", "").replace("yes", ""))
-                    res = map(float, res[1:])
-                    farField = dict()
-                    farField["static_pressure"] = res[0]
-                    farField["mach"] = res[1]
-                    farField["temperature"] = res[2]
-                    farField["alpha"] = np.arctan(res[5] / res[3]) / np.pi * 180
-                    self.output["farFieldConditions"] = farField
-                    break
-
-                if prevLine.search(line):
-                    found = True
-
-        if not found:
-            print "The boundary conditions setup not found"
+    def parseMachAlphaBoundaryCondition(self, line):
+        # pressurefarfield no 89875. no 1.10 no 281.65 yes no -1. no 5e-5 no 0. no no yes 0.1 50.
+        res = re.split(r'\s+', line.strip().replace("no", "").replace("yes", ""))
+        res = map(float, res[1:])
+        farField = dict()
+        farField["static_pressure"] = res[0]
+        farField["mach"] = res[1]
+        farField["temperature"] = res[2]
+        farField["alpha"] = np.arctan(res[5] / res[3]) / np.pi * 180
+        self.output["farFieldConditions"] = farField
+
+        self.lineProcessor = None
+
+    def parseIterate(self, line, res):
+        self.nIterationsRequested += int(res.group(1))
+        if self.residualHistory is not None:
+            self.residualHistory.reserve(self.nIterationsRequested)
+
+    def parseResidualNames(self, line, res):
+        # iter continuity x-velocity ... time/iter
+        names = line.split()
+        if self.history:
+            if self.residualHistory is None:
+                self.residualHistory = ResidualHistory(names[:-1], self.nIterationsRequested or 1024)
+            elif self.residualHistory.names != names[:-1]:
+                raise Exception("The residual header: " + line.strip() +
+                                "\ndoes not match the columns of previous header in the same log")
+
+        self.residualNames = names
+
+    def parseResidualValues(self, line, res):
+        # Residual rows are: iter, residuals..., time, iterations left. The rows are interleaved with FMG/AMG
+        # messages and other numbered listings, all of them are skipped by the row length check.
+        if self.residualNames is None:
+            return
 
-    def parseIterNumberAndResiduals(self):
-        lineBuffer = []
-        residualsMatcher = re.compile(r'\s*iter\s*')
+        values = line.split()
+        if len(values) != len(self.residualNames) + 1:
+            return
 
-        residualLine = ""
+        self.residualValues = values
 
-        for line in ropen(self.path):
-            if residualsMatcher.match(line):
-                residualLine = line
-                break
-            else:
-                lineBuffer.append(line)
+        if self.residualHistory is not None:
+            self.residualHistory.append(map(float, values[:len(self.residualNames) - 1]))
 
-        residualNames = re.split(r'\s+', residualLine.strip())
+    def processLine(self, line):
+        # Skip empty line
+        if len(line) == 0 or line.isspace():
+            return
 
-        residualValues = []
-        for line in lineBuffer[-1::-1]:
-            tmp = re.split(r'\s+', line.strip())
+        if self.lineProcessor is not None:
+            self.lineProcessor(line)
+            return
 
-            if len(tmp) != len(residualNames) + 1:
-                break
+        for matcher, processor in self.matchers:
+            res = matcher(line)
+            if res:
+                processor(line, res)
+                return
 
-            residualValues = tmp
+    def updateOutput(self):
+        if self.residualValues is None:
+            raise Exception("The residual rows not found")
 
-        nIter = int(residualValues[0])
-        self.output["nIteration"] = nIter
+        self.output["nIteration"] = int(self.residualValues[0])
 
-        residualNames = residualNames[1:-1]
-        residualValues = map(float, residualValues[1:-2])
+        residualNames = self.residualNames[1:-1]
+        residualValues = map(float, self.residualValues[1:-2])
         self.output["residuals"] = dict(zip(residualNames, residualValues))
 
     def parse(self):
-        self.parseCaseName()
-        self.parseIterNumberAndResiduals()
-        self.parseMachAlphaBoundaryCondition()
+        with openInput(self.path) as f:
+            self.parseLines(f)
+
+    def parseLines(self, lines):
+        """
+        Parses the log from any iterable of lines, e.g. the archive member stream
+        """
+        for line in Profiling.countLines(self.path, lines):
+            self.processLine(line)
+
+        self.updateOutput()
+
+        if "farFieldConditions" not in self.output:
+            print "The boundary conditions setup not found"
+
+
+class LogFollower:
+    """
+    Follows the log of running Fluent job. The byte offset of already parsed part and the partial last line are kept
+    between the polls, so each poll() parses only the newly appended bytes, no matter how long the log is:
+
+        follower = LogFollower("case_1/fluent_log.log")
+        while True:
+            print follower.poll()["nIteration"]
+            time.sleep(30)
+    """
+    monitorRegex = re.compile(r'^C[a-z]-\d+$')
+
+    def __init__(self, path, window=250, monitors=None, chunkSize=1 << 20):
+        self.path = path
+        self.window = window
+        self.monitors = monitors
+        self.chunkSize = chunkSize
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.partialLine = ""
+        self.parser = LogParser(self.path, history=True)
+
+    def poll(self):
+        """
+        Parses the bytes appended since the last poll and returns the convergence snapshot
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return self.snapshot()
+
+        # The log was replaced, e.g. the job was restarted
+        if size < self.offset:
+            self.reset()
+
+        if size > self.offset:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                while self.offset < size:
+                    chunk = f.read(min(self.chunkSize, size - self.offset))
+                    if not chunk:
+                        break
+                    self.offset += len(chunk)
+
+                    lines = (self.partialLine + chunk).split("\n")
+                    self.partialLine = lines.pop()
+                    for line in lines:
+                        self.parser.processLine(line + "\n")
+
+        return self.snapshot()
+
+    def snapshot(self):
+        """
+        Returns dictionary with the case name, the latest iteration number and residuals, and the moving average
+        of the monitors (Cd-1, Cl-1, ...) over the last self.window iterations
+        """
+        parser = self.parser
+        snapshot = {"caseName": parser.output.get("caseName"),
+                    "farFieldConditions": parser.output.get("farFieldConditions"),
+                    "nIteration": 0,
+                    "residuals": dict(),
+                    "movingAverage": dict()}
+
+        if parser.residualValues is None:
+            return snapshot
+
+        parser.updateOutput()
+        snapshot["nIteration"] = parser.output["nIteration"]
+        snapshot["residuals"] = parser.output["residuals"]
+
+        history = parser.residualHistory
+        monitors = self.monitors
+        if monitors is None:
+            monitors = [name for name in history.names if self.monitorRegex.match(name)]
+        for name in monitors:
+            if name in history.columns:
+                snapshot["movingAverage"][name] = float(history[name][-self.window:].mean())
+
+        return snapshot
 
 
 class ForceParser:
+    """
+    State machine parsing the Force Report files, self.lineProcessor holds the method which is going to process the
+    next line. The zone rows of a table (from the header to the Net row) are collected and decoded at once into
+    the array of shape (zones, columns, components), which becomes the values of the ForceReport in the output. The
+    tables, which don't fit the ForceReport (e.g. the groups with different force types), are kept as dictionaries.
+    """
+    # False keeps all tables as dictionaries, e.g. when the parser moves them around while parsing
+    compactTables = True
+
+    vectorRegex = re.compile(r'\(([^\)]+)')
+    scalarRegex = re.compile(r'\s*([^\s]+)\s*')
+
     def __init__(self, path, singleForce=False):
         self.path = path
 
@@ -257,6 +541,14 @@ class ForceParser:
 
         self.additionalForceDefinition = []
 
+        self.forceName = None
+
+        self.groupNames = []
+
+        self.forceNames = []
+
+        self.zoneRows = []
+
 
     def parseDocumentTitle(self, line):
         title = re.search(r'"Force Report"', line)
@@ -301,6 +593,7 @@ class ForceParser:
 
             # Append empty force
             self.output[fullname] = self.forceDict
+            self.forceName = fullname
 
         else:  # When only single output is present, e. g. the CoPy file
             self.output = self.forceDict
@@ -315,8 +608,10 @@ class ForceParser:
                             "\ncould not be parsed to find force group names like Force (n), Coefficients")
 
         # Append empty gorups
+        self.groupNames = []
         for groupName in res:
             self.forceDict[groupName[0]] = dict()
+            self.groupNames.append(groupName[0])
 
         self.lineProcessor = self.parseForceNames
 
@@ -328,80 +623,547 @@ class ForceParser:
 
         forceNames = res[1:]
 
-        nGroups = len(self.forceDict) - len(self.additionalForceDefinition)
+        nGroups = len(self.groupNames)
         nForceTypes = int(len(forceNames) / nGroups)
 
         # Append force names to dictionary
-        grId = 0
-        for groupName in self.forceDict:
-            if groupName in self.additionalForceDefinition:
-                continue
-
+        for grId, groupName in enumerate(self.groupNames):
             forceGroupDic = self.forceDict[groupName]
             for fid in range(nForceTypes):
                 forceGroupDic[forceNames[grId * nForceTypes + fid]] = dict()
 
-            grId += 1
+        self.forceNames = forceNames
+        self.zoneRows = []
+        self.lineProcessor = self.collectZoneRows
+
+    def collectZoneRows(self, line):
+        self.zoneRows.append(line)
+
+        if line[0] == "-":
+            self.lastForce = True
+        elif self.lastForce:
+            # The Net row closes the table
+            self.lastForce = False
+            self.decodeZoneTable()
+
+    def decodeZoneTable(self):
+        rows = self.zoneRows
+        self.zoneRows = []
+
+        zones = []
+        values = []
+        for line in rows:
+            if line[0] == "-":
+                continue
+            zoneName, zoneValues = line.split(None, 1)
+            zones.append(zoneName)
+            values.append(zoneValues)
+
+        nColumns = len(self.forceNames)
+        first = self.vectorRegex.search(values[0]) if values else None
+        nComponents = len(first.group(1).split()) if first else 1
+
+        try:
+            table = np.array(" ".join(values).replace("(", " ").replace(")", " ").split(), dtype=float)
+            table = table.reshape(len(zones), nColumns, nComponents)
+        except ValueError:
+            # Irregular table, fall back to the line by line parsing
+            for line in rows:
+                self.parseForceValuesAndAssignToZone(line)
+            self.finishTable()
+            return
+
+        nForceTypes = nColumns / len(self.groupNames)
+        report = self.compactReport(zones, table, nForceTypes)
+        if report is not None:
+            if self.singleForce:
+                self.output = report
+            else:
+                self.output[self.forceName] = report
+            self.finishTable()
+            return
 
-        self.lineProcessor = self.parseForceValuesAndAssignToZone
+        # Dictionary of the table
+        for grId, groupName in enumerate(self.groupNames):
+            forceGroupDic = self.forceDict[groupName]
+            for fid in range(nForceTypes):
+                column = grId * nForceTypes + fid
+                if nComponents == 1:
+                    columnValues = table[:, column, 0].tolist()
+                else:
+                    columnValues = table[:, column, :].tolist()
+                forceGroupDic[self.forceNames[column]] = dict(zip(zones, columnValues))
+
+        self.finishTable()
+
+    def compactReport(self, zones, table, nForceTypes):
+        """
+        Returns the ForceReport of the decoded table, None when the table can't be stored as the rectangular array
+        (the groups differ in the force types, or the names repeat)
+        """
+        nGroups = len(self.groupNames)
+        types = self.forceNames[:nForceTypes]
+        if not self.compactTables or not zones or nGroups * nForceTypes != len(self.forceNames):
+            return None
+        if len(set(zones)) != len(zones) or len(set(types)) != len(types) or len(set(self.groupNames)) != nGroups:
+            return None
+        for grId in range(1, nGroups):
+            if self.forceNames[grId * nForceTypes:(grId + 1) * nForceTypes] != types:
+                return None
+
+        # (zones, groups * types, components) -> (groups, types, zones, components)
+        values = table.reshape(len(zones), nGroups, nForceTypes, -1).transpose(1, 2, 0, 3)
+        definitions = dict((name, self.forceDict[name]) for name in self.additionalForceDefinition)
+        return ForceReport(self.groupNames, types, zones, np.ascontiguousarray(values), definitions)
+
+    def finishTable(self):
+        self.lastForce = False
+        self.lineProcessor = self.parseForceTitle
+        self.additionalForceDefinition = []
 
     def parseForceValuesAndAssignToZone(self, line):
 
         if line[0] == "-":
-            self.lastForce = True
             return
 
         res = re.search(r'([^\s]+)', line)
         zoneName = res.group(0)
 
-        vectorRegex = re.compile(r'\(([^\)]+)')
-        scalarRegex = re.compile(r'\s*([^\s]+)\s*')
-
         # Parse appropriate type
-        if vectorRegex.search(line):
-            res = vectorRegex.findall(line)
-            values = map(lambda s: map(float, re.split("\s", s)), res)
+        if self.vectorRegex.search(line):
+            res = self.vectorRegex.findall(line)
+            values = map(lambda s: map(float, s.split()), res)
 
-        elif scalarRegex.search(line):
-            res = scalarRegex.findall(line)
+        elif self.scalarRegex.search(line):
+            res = self.scalarRegex.findall(line)
             values = map(float, res[1:])
         else:
             self.lineProcessor = None
             return
 
-        nGroups = len(self.forceDict) - len(self.additionalForceDefinition)
-        nForceTypes = len(values) / nGroups
+        nForceTypes = len(values) / len(self.groupNames)
 
-        grId = 0
-        for groupName in self.forceDict:
-            if groupName in self.additionalForceDefinition:
+        for grId, groupName in enumerate(self.groupNames):
+            for fid in range(nForceTypes):
+                forceName = self.forceNames[grId * nForceTypes + fid]
+                self.forceDict[groupName][forceName][zoneName] = values[grId * nForceTypes + fid]
+
+    def parse(self):
+        with openInput(self.path) as fptr:
+            self.parseLines(fptr)
+
+    def parseLines(self, lines):
+        """
+        Parses the report from any iterable of lines, e.g. the archive member stream
+        """
+        # Time spent in each lineProcessor, only when profiling (see Profiling.py)
+        states = Profiling.lineStates(self.path)
+
+        for line in Profiling.countLines(self.path, lines):
+
+            # Skip empty line
+            if len(line.strip()) == 0:
                 continue
 
-            forceGroupDic = self.forceDict[groupName]
-            for fid, forceName in enumerate(forceGroupDic):
-                forceGroupDic[forceName][zoneName] = values[grId * nForceTypes + fid]
-            grId += 1
+            # Check if any processor left for predefined work
+            if self.lineProcessor is None:
+                break
 
-        if self.lastForce:
-            self.lastForce = False
+            # Process line
+            if states is None:
+                self.lineProcessor(line)
+            else:
+                processor = self.lineProcessor
+                start = time.time()
+                processor(line)
+                states[processor.__name__] += time.time() - start
+
+        # Table cut before its Net row
+        if self.zoneRows:
+            self.decodeZoneTable()
+
+
+NAME_INDICES = dict()
+
+
+class NameIndex(object):
+    """
+    Names of one axis of the ForceReport with the name -> index lookup. The indices are shared by all reports with
+    the same names (see nameIndex), so the zone, group and type names are stored once per campaign.
+    """
+    __slots__ = ("names", "ids")
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+
+def nameIndex(names):
+    names = tuple(names)
+    try:
+        return NAME_INDICES[names]
+    except KeyError:
+        index = NAME_INDICES[names] = NameIndex(names)
+        return index
+
+
+class SlottedMapping(object):
+    """
+    Read-only mapping methods of the ForceReport and its views. On Python 2 collections.Mapping declares no
+    __slots__, so its subclasses would get the instance __dict__ anyway, these classes are registered with it instead.
+    """
+    __slots__ = ()
+    __hash__ = None
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self)
+
+    def iterkeys(self):
+        return iter(self)
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def iteritems(self):
+        return ((key, self[key]) for key in self)
+
+    def __eq__(self, other):
+        if not isinstance(other, collections.Mapping):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+
+class ForceReport(SlottedMapping):
+    """
+    Compact form of one force report: the values are kept in single float64 array of shape (groups, types, zones,
+    components) and the names in the shared NameIndex tables. ForceParser builds it right from the decoded table. The
+    report still reads as the nested dictionary group -> type -> zone -> value (float, or list for the vector tables)
+    with the additional force definitions (e.g. "Direction Vector" -> [1, 0, 0]), so Data and Data.table work
+    unchanged, while the cross case arithmetic is plain slicing:
+
+        fins = report.select("Coefficients", "Total", ["ster1", "ster2", "ster3", "ster4"]).sum(axis=0)
+    """
+    __slots__ = ("groups", "types", "zones", "values", "definitions")
+
+    def __init__(self, groups, types, zones, values, definitions=None):
+        self.groups = nameIndex(groups)
+        self.types = nameIndex(types)
+        self.zones = nameIndex(zones)
+        self.values = values
+        self.definitions = definitions or dict()
+
+    def __reduce__(self):
+        # Sent from the pool workers by the names, so the NameIndex tables are shared again
+        return ForceReport, (self.groups.names, self.types.names, self.zones.names, self.values, self.definitions)
+
+    @classmethod
+    def fromDict(cls, report):
+        """
+        Returns the ForceReport of the report dictionary, None when its tables are not rectangular (some group misses
+        some type or zone), then the dictionary has to be kept
+        """
+        definitions = dict()
+        groups = []
+        for name in report:
+            if isinstance(report[name], collections.Mapping):
+                groups.append(name)
+            else:
+                definitions[name] = report[name]
+        if not groups:
+            return None
+
+        types = list(report[groups[0]])
+        zones = list(report[groups[0]][types[0]]) if types else []
+        if not zones:
+            return None
+
+        first = report[groups[0]][types[0]][zones[0]]
+        nComponents = len(first) if isinstance(first, list) else 1
+
+        values = np.empty((len(groups), len(types), len(zones), nComponents))
+        try:
+            for groupId, groupName in enumerate(groups):
+                group = report[groupName]
+                if len(group) != len(types):
+                    return None
+                for typeId, typeName in enumerate(types):
+                    forceType = group[typeName]
+                    if len(forceType) != len(zones):
+                        return None
+                    values[groupId, typeId] = [forceType[zoneName] if nComponents > 1 else [forceType[zoneName]]
+                                               for zoneName in zones]
+        except (KeyError, ValueError, TypeError):
+            return None
+
+        return cls(groups, types, zones, values, definitions)
+
+    def select(self, groupName, typeName, zoneNames=None):
+        """
+        Array view (zones, components) of the group and type, optionally only of the given zones
+        """
+        values = self.values[self.groups.ids[groupName], self.types.ids[typeName]]
+        if zoneNames is None:
+            return values
+        return values[[self.zones.ids[zoneName] for zoneName in zoneNames]]
+
+    def __getitem__(self, name):
+        if name in self.definitions:
+            return self.definitions[name]
+        return ForceGroupView(self, self.groups.ids[name])
+
+    def __iter__(self):
+        return iter(list(self.definitions) + list(self.groups.names))
+
+    def __len__(self):
+        return len(self.definitions) + len(self.groups)
+
+
+class ForceGroupView(SlottedMapping):
+    __slots__ = ("report", "groupId")
+
+    def __init__(self, report, groupId):
+        self.report = report
+        self.groupId = groupId
+
+    def __getitem__(self, name):
+        return ForceTypeView(self.report.values[self.groupId, self.report.types.ids[name]], self.report.zones)
+
+    def __iter__(self):
+        return iter(self.report.types.names)
+
+    def __len__(self):
+        return len(self.report.types)
+
+
+class ForceTypeView(SlottedMapping):
+    __slots__ = ("values", "zones")
+
+    def __init__(self, values, zones):
+        self.values = values
+        self.zones = zones
+
+    def __getitem__(self, name):
+        value = self.values[self.zones.ids[name]]
+        if len(value) == 1:
+            return float(value[0])
+        return value.tolist()
+
+    def __iter__(self):
+        return iter(self.zones.names)
+
+    def __len__(self):
+        return len(self.zones)
+
+
+for mappingClass in [ForceReport, ForceGroupView, ForceTypeView]:
+    collections.Mapping.register(mappingClass)
+
+
+def compactData(data):
+    """
+    Replaces the force reports of the case data (DirectoryParser.data) by ForceReport objects, in place. The reports
+    which can't be stored as the rectangular array are kept as dictionaries.
+    """
+    for fileName in data:
+        if fileName == "Log" or not isinstance(data[fileName], dict):
+            continue
+        if fileName in SINGLE_FORCE_FILES:
+            data[fileName] = ForceReport.fromDict(data[fileName]) or data[fileName]
+            continue
+        for forceName in data[fileName]:
+            report = data[fileName][forceName]
+            if isinstance(report, dict):
+                data[fileName][forceName] = ForceReport.fromDict(report) or report
+    return data
+
+
+def plainData(value):
+    """
+    The default hook of json.dump, which writes the ForceReport and its views as the dictionaries
+    """
+    if isinstance(value, collections.Mapping):
+        return dict(value)
+    raise TypeError(repr(value) + " is not JSON serializable")
+
+
+def reportMetadata(text):
+    """
+    Case description from the consolidated report title or file name, e.g.
+    "Alfa 10 Ma 3.85 (viscid, medium-block, rotate 30) 15885 iter." -> alpha 10, mach 3.85, mesh "medium-block",
+    rotation 30, flags ["viscid"], nIteration 15885. Returns None when the text doesn't match.
+    """
+    match = ReportParser.titleRegex.search(text)
+    if not match:
+        return None
+
+    metadata = {"alpha": float(match.group(1).replace(",", ".")),
+                "mach": float(match.group(2).replace(",", ".")),
+                "mesh": None,
+                "rotation": 0.0,
+                "flags": [],
+                "nIteration": int(match.group(4)) if match.group(4) else None}
+
+    for option in (match.group(3) or "").split(","):
+        option = option.strip()
+        rotation = re.match(r'rotate\s+(-?[\d.]+)', option)
+        if rotation:
+            metadata["rotation"] = float(rotation.group(1))
+        elif "block" in option:
+            metadata["mesh"] = option
+        elif option:
+            metadata["flags"].append(option)
+
+    return metadata
+
+
+class ReportParser(ForceParser):
+    """
+    Parser of the consolidated report files (e.g. "VISCID BLOCK - wyniki/Alfa 10 Ma 3.85 (viscid, medium-block).txt"),
+    which hold all force reports of the case in one file: the title line, the force and moment tables, the centers of
+    pressure, the Integral tables and the COP lines. The tables are parsed by the ForceParser state machine and placed
+    under the same keys as the DirectoryParser uses, so Data.table works on the output as well. The n-th direction
+    vector table goes to FX, FY, FZ and the n-th moment axis table to MX, MY, MZ. Alpha, Mach, mesh and rotation are
+    taken from the file name, the title line is used when the file name doesn't describe the case.
+    """
+    titleRegex = re.compile(r'Alfa\s+(-?[\d.,]+)\s+Ma\s+([\d.,]+)\s*(?:\(([^\)]*)\))?\s*(?:(\d+)\s+iter)?')
+    copRegex = re.compile(r'([XYZ])\s*=\s*(-?[\d.,]+)\s*m(?:\s*\(([-+]?[\d.,]+)\s*CAL)?')
+
+    sharedReports = {"Forces": ["FX", "FY", "FZ"],
+                     "Moments - Moment Center": ["MX", "MY", "MZ"]}
+    orderedReports = {"Forces - Direction Vector": ["FX", "FY", "FZ"],
+                      "Moments - Moment Center Moment Axis": ["MX", "MY", "MZ"]}
+
+    # The force dictionaries are placed under the file names before their tables are parsed
+    compactTables = False
+
+    def __init__(self, path):
+        ForceParser.__init__(self, path)
+
+        self.lineProcessor = self.parseReportTitle
+
+        self.title = None
+
+        self.reportCounts = dict()
+
+        self.integral = None
+
+    def parseReportTitle(self, line):
+        self.title = line.strip()
+        if reportMetadata(self.title) is None:
+            raise Exception("The line " + self.title + " is not the report title like "
+                            "Alfa 10 Ma 3.85 (viscid, medium-block) 10000 iter.")
+
+        self.lineProcessor = self.parseForceTitle
+
+    def parseForceTitle(self, line):
+        title = line.strip()
+
+        if title == "Integral":
+            self.lineProcessor = self.parseIntegralName
+            return
+
+        if title == "COP:":
+            self.lineProcessor = self.parseCenterOfPressure
+            return
+
+        if title.startswith("Center of Pressure"):
+            # Same structure as the CoPy and CoPz files, the title is the only group
+            self.forceName = "CoP" + re.search(r'Set Coordinate\s+(\w)', title).group(1)
+            self.forceDict = dict()
+            self.output[self.forceName] = self.forceDict
+            self.parseForceGroups(line)
+            return
+
+        ForceParser.parseForceTitle(self, line)
+        if self.lineProcessor != self.parseForceGroups:
+            return
+
+        name = self.forceName
+        if name in self.sharedReports:
+            report = self.output.pop(name)
+            for fileName in self.sharedReports[name]:
+                self.output.setdefault(fileName, dict())[name] = report
+        elif name in self.orderedReports:
+            count = self.reportCounts.get(name, 0)
+            self.reportCounts[name] = count + 1
+            if count < len(self.orderedReports[name]):
+                fileName = self.orderedReports[name][count]
+                self.output.setdefault(fileName, dict())[name] = self.output.pop(name)
+                self.forceName = (fileName, name)
+
+    def parseIntegralName(self, line):
+        # e.g. "copx" or "Static Pressure         (pascal)(m2)"
+        name = re.split(r'\s{2,}', line.strip())[0]
+        self.integral = self.output.setdefault("Integral", dict()).setdefault(name, dict())
+        self.lineProcessor = self.parseIntegralValue
+
+    def parseIntegralValue(self, line):
+        if line.strip()[0] == "-":
+            return
+
+        zoneName, value = line.split()
+        self.integral[zoneName] = float(value)
+
+        if zoneName == "Net":
             self.lineProcessor = self.parseForceTitle
-            self.additionalForceDefinition = []
 
-    def parse(self):
-        with open(self.path, "r") as fptr:
-            for line in fptr.readlines():
+    def parseCenterOfPressure(self, line):
+        # e.g. "X = 1,5306 m (+3,275 CAL.)", the decimal comma is used
+        match = self.copRegex.match(line.strip())
+        if not match:
+            self.lineProcessor = self.parseForceTitle
+            self.parseForceTitle(line)
+            return
 
-                # Skip empty line
-                if len(line.strip()) == 0:
-                    continue
+        cop = self.output.setdefault("COP", dict())
+        cop[match.group(1)] = float(match.group(2).replace(",", "."))
+        if match.group(3):
+            cop["calibers"] = float(match.group(3).replace(",", "."))
 
-                # Check if any processor left for predefined work
-                if self.lineProcessor is None:
-                    break
+    def parseLines(self, lines):
+        ForceParser.parseLines(self, lines)
+
+        if self.title is None:
+            raise Exception("The file " + self.path + " is empty")
+
+        fileName = os.path.basename(self.path)
+        if isCompressed(fileName):
+            fileName = os.path.splitext(fileName)[0]
+        caseName = os.path.splitext(fileName)[0]
+        titleMetadata = reportMetadata(self.title)
+        metadata = reportMetadata(caseName) or titleMetadata
+
+        self.output["Log"] = {"caseName": caseName,
+                              "nIteration": titleMetadata["nIteration"],
+                              "farFieldConditions": {"mach": metadata["mach"], "alpha": metadata["alpha"]}}
+        self.output["Report"] = {"title": self.title,
+                                 "mesh": metadata["mesh"],
+                                 "rotation": metadata["rotation"],
+                                 "flags": metadata["flags"]}
 
-                # Process line
-                self.lineProcessor(line)
 
+# Change whenever the parsers start to produce different output, it invalidates the cached results (see Cache.py)
+PARSER_VERSION = "1.2"
 
 FILES = {"Log" : "fluent_log.log",
          "FX"  : "FX",
@@ -413,112 +1175,398 @@ FILES = {"Log" : "fluent_log.log",
          "CoPy": "CoPy",
          "CoPz": "CoPz"}
 
+SINGLE_FORCE_FILES = ["CoPy", "CoPz"]
+
+
+def createParser(name, path):
+    if name == "Log":
+        return LogParser(path)
+    return ForceParser(path, singleForce=name in SINGLE_FORCE_FILES)
+
+
+def runParser(name, parser, lines=None):
+    """
+    Runs the parser on its file, or on the given lines, and returns (name, output, error message or None)
+    """
+    error = None
+    try:
+        with Profiling.Timer(name, parser.path):
+            if lines is None:
+                parser.parse()
+            else:
+                parser.parseLines(lines)
+    except IOError:
+        error = "Parser " + name + " error.\nCouldn't open file " + os.path.basename(parser.path)
+    except Exception as e:
+        error = "Parser " + name + " error.\nCouldn't parse the " + os.path.basename(
+            parser.path) + " file\n" + str(e) + "\n"
+
+    return name, parser.output, error
+
+
+def parseFile(nameAndPath):
+    """
+    Parses single output file and returns (name, output, error message or None). Defined on the module level, so it
+    can be sent to the multiprocessing pool workers.
+    """
+    name, path = nameAndPath
+    return runParser(name, createParser(name, path))
+
+
 class DirectoryParser:
     def __init__(self, directoryPath):
         self.directory = directoryPath
 
         self.data = dict()
 
+        self.errors = []
+
+    def tasks(self):
+        return [(name, self.directory + os.sep + FILES[name]) for name in sorted(FILES)]
+
+    def collect(self, results):
+        for name, output, error in results:
+            if error:
+                print error
+                self.errors.append(error)
+
+            if len(output) != 0:
+                self.data[name] = output
+
+    def load(self, pool=None):
+        """
+        Parses all files from the directory. When the multiprocessing pool is given the files are parsed by its workers
+        """
+        if pool is None:
+            self.collect(map(parseFile, self.tasks()))
+        else:
+            self.collect(pool.map(parseFile, self.tasks()))
+
+    def loadFrom(self, contents):
+        """
+        Parses the files already read into memory (see Prefetcher), contents: name -> readInput result. The files
+        missing in contents (e.g. not readable) are parsed from the disk, so their errors are reported as usual. The
+        lines are streamed from the decompressed file, so they are never held in memory all at once.
+        """
+        results = []
+        for name, path in self.tasks():
+            content = contents.get(name)
+            if content is None:
+                results.append(parseFile((name, path)))
+                continue
+
+            resolvedPath, stat, data = content
+            start = time.time()
+            try:
+                lines = io.BytesIO(decompress(resolvedPath, data))
+            except Exception:
+                results.append(parseFile((name, path)))
+                continue
+            if Profiling.active is not None:
+                Profiling.addReadTime(path, time.time() - start)
+            results.append(runParser(name, createParser(name, path), lines))
+
+        self.collect(results)
+
+    def dump(self, outputFile=None):
+        if not outputFile:
+            outputFile = "output.json"
+
+        with open(outputFile, 'w') as fptr:
+            json.dump(self.data, fptr, indent=4, default=plainData)
+
+    def compact(self):
+        """
+        Turns the force reports kept as dictionaries into compact arrays (see ForceReport) where possible, the parsers
+        build them directly already, so this matters only for the data filled from elsewhere
+        """
+        compactData(self.data)
+
+
+class Prefetcher:
+    """
+    Reads the files of the case directories in the background threads, ahead of the parsing, which hides the latency
+    of the network filesystems. At most lookahead cases beyond the one being parsed are kept in memory as the raw
+    (possibly compressed) bytes, so the peak memory grows with (lookahead + 1) x the case size:
+
+        for directory, contents in Prefetcher(directories, workers=8):
+            parser = DirectoryParser(directory)
+            parser.loadFrom(contents)
+
+    The contents maps the names from FILES to the readInput results, None when the file couldn't be read.
+    """
+    def __init__(self, directories, workers=8, lookahead=2):
+        self.directories = iter(directories)
+        self.workers = workers
+        self.lookahead = lookahead
+        self.queue = collections.deque()
+        self.pool = None
+
+    def submit(self):
+        directory = next(self.directories, None)
+        if directory is None:
+            return False
+
+        results = dict()
+        for name in sorted(FILES):
+            results[name] = self.pool.apply_async(readInput, (directory + os.sep + FILES[name],))
+        self.queue.append((directory, results))
+        return True
+
+    def __iter__(self):
+        self.pool = ThreadPool(self.workers)
+        try:
+            while len(self.queue) <= self.lookahead and self.submit():
+                pass
+
+            while self.queue:
+                directory, results = self.queue.popleft()
+                self.submit()
+
+                contents = dict()
+                for name in results:
+                    try:
+                        contents[name] = results[name].get()
+                    except Exception:
+                        contents[name] = None
+                yield directory, contents
+        finally:
+            self.pool.close()
+            self.pool.join()
+
+
+class ReportDirectoryParser:
+    """
+    Parses all consolidated report files (*.txt, see ReportParser) of the directory, e.g. "VISCID BLOCK - wyniki".
+    The data of each report is kept under its file name (without the extension) and array() collects the whole
+    directory into one numpy structured array.
+    """
+    def __init__(self, directoryPath):
+        self.directory = directoryPath
+
+        self.data = dict()
+
+        self.errors = []
+
+    def paths(self):
+        return [self.directory + os.sep + name for name in sorted(os.listdir(self.directory))
+                if name.endswith(".txt") or isCompressed(name) and os.path.splitext(name)[0].endswith(".txt")]
+
     def load(self):
-        parsers = {"Log": LogParser(self.directory + os.sep + FILES["Log"]),
-                   "FX": ForceParser(self.directory + os.sep + FILES["FX"]),
-                   "FY": ForceParser(self.directory + os.sep + FILES["FY"]),
-                   "FZ": ForceParser(self.directory + os.sep + FILES["FZ"]),
-                   "MX": ForceParser(self.directory + os.sep + FILES["MX"]),
-                   "MY": ForceParser(self.directory + os.sep + FILES["MY"]),
-                   "MZ": ForceParser(self.directory + os.sep + FILES["MZ"]),
-                   "CoPy": ForceParser(self.directory + os.sep + FILES["CoPy"], singleForce=True),
-                   "CoPz": ForceParser(self.directory + os.sep + FILES["CoPz"], singleForce=True)}
-
-        for name in parsers:
-            parser = parsers[name]
+        for path in self.paths():
+            parser = ReportParser(path)
             try:
-                parser.parse()
+                with Profiling.Timer("Report", path):
+                    parser.parse()
             except IOError:
-                print "Parser " + name + " error.\nCouldn't open file " + os.path.basename(parser.path)
+                error = "Couldn't open file " + os.path.basename(path)
+                print error
+                self.errors.append(error)
+                continue
             except Exception as e:
-                print "Parser " + name + " error.\nCouldn't parse the " + os.path.basename(
-                    parser.path) + " file\n" + e.message + "\n"
+                error = "Couldn't parse the " + os.path.basename(path) + " file\n" + str(e)
+                print error
+                self.errors.append(error)
+                continue
 
-            if len(parser.output) != 0:
-                self.data[name] = parser.output
+            self.data[parser.output["Log"]["caseName"]] = parser.output
 
     def dump(self, outputFile=None):
         if not outputFile:
             outputFile = "output.json"
 
         with open(outputFile, 'w') as fptr:
-            json.dump(self.data, fptr, indent=4)
+            json.dump(self.data, fptr, indent=4, default=plainData)
+
+    def array(self, componentName="Net"):
+        """
+        Structured array with one record per report: name, mesh, flags, alpha, mach, rotation, nIteration, the
+        Data.table coefficients (named as Data attributes, e.g. CX_global) and the COP coordinates. Values missing in
+        a report are NaN.
+        """
+        names = sorted(self.data)
+
+        tables = dict()
+        titles = []
+        for name in names:
+            try:
+                tableTitles, row = Data(self.data[name]).table(componentName)
+            except Exception:
+                continue
+            tables[name] = dict(zip(tableTitles, row))
+            for title in tableTitles:
+                if title not in titles and title not in ("mach", "alpha"):
+                    titles.append(title)
+
+        def textLength(values):
+            return max([len(value) for value in values] + [1])
+
+        reports = [self.data[name]["Report"] for name in names]
+        flags = [",".join(report["flags"]) for report in reports]
+        meshes = [report["mesh"] or "" for report in reports]
+
+        dtype = [("name", "S%d" % textLength(names)),
+                 ("mesh", "S%d" % textLength(meshes)),
+                 ("flags", "S%d" % textLength(flags)),
+                 ("alpha", np.float64),
+                 ("mach", np.float64),
+                 ("rotation", np.float64),
+                 ("nIteration", np.int64)]
+        dtype += [(simpleKey(title), np.float64) for title in titles]
+        dtype += [("COP_" + axis, np.float64) for axis in ("X", "Y", "Z", "calibers")]
+
+        array = np.zeros(len(names), dtype=dtype)
+        for i, name in enumerate(names):
+            data = self.data[name]
+            log = data["Log"]
+            record = array[i]
+            record["name"] = name
+            record["mesh"] = meshes[i]
+            record["flags"] = flags[i]
+            record["alpha"] = log["farFieldConditions"]["alpha"]
+            record["mach"] = log["farFieldConditions"]["mach"]
+            record["rotation"] = data["Report"]["rotation"]
+            record["nIteration"] = log["nIteration"] or 0
+            for title in titles:
+                record[simpleKey(title)] = tables.get(name, dict()).get(title, np.nan)
+            cop = data.get("COP", dict())
+            for axis in ("X", "Y", "Z", "calibers"):
+                record["COP_" + axis] = cop.get(axis, np.nan)
+
+        return array
+
+
+class CSVWriter:
+    """
+    Writes the CSV rows as they come, buffered and written in bulk every bufferSize rows
+    """
+    def __init__(self, fptr, titles=None, bufferSize=1024):
+        self.fptr = fptr
+        self.titles = None
+        self.bufferSize = bufferSize
+        self.buffer = []
+
+        if titles is not None:
+            self.writeTitles(titles)
+
+    def writeTitles(self, titles):
+        self.titles = list(titles)
+        self.buffer.append(",".join(self.titles))
+
+    def writeRow(self, row):
+        self.buffer.append(",".join(map(str, row)))
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def writeRows(self, rows):
+        for row in rows:
+            self.writeRow(row)
+
+    def flush(self):
+        if self.buffer:
+            self.fptr.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
 
 
 def writeCSV(fptr, titles, array2D):
-    for name in titles[:-1]:
-        fptr.write(name + ",")
-    fptr.write(titles[-1] + "\n")
-
-    for rowId, row in enumerate(array2D):
-        for element in row[:-1]:
-            fptr.write(str(element) + ",")
-        newline = '\n'
-        if rowId > len(array2D) - 1:
-            newline = ''
-        fptr.write(str(row[-1]) + newline)
-
-class Data:
-    def __init__(self, jsonPathOrDataDict):
+    writer = CSVWriter(fptr, titles)
+    writer.writeRows(array2D)
+    writer.flush()
+
+
+class JSONObjectWriter:
+    """
+    Writes the JSON object member by member, the same way as json.dump(dictionary, fptr, indent=4) would do it,
+    but without keeping the whole dictionary in memory. close() writes the closing bracket.
+    """
+    def __init__(self, fptr):
+        self.fptr = fptr
+        self.count = 0
+
+    def write(self, key, value):
+        self.fptr.write("{\n    " if self.count == 0 else ", \n    ")
+        self.fptr.write(json.dumps(key) + ": " +
+                        json.dumps(value, indent=4, default=plainData).replace("\n", "\n    "))
+        self.count += 1
+
+    def close(self):
+        self.fptr.write("{}" if self.count == 0 else "\n}")
+
+    def checkpoint(self):
+        """
+        Writes the closing bracket, so the file is valid JSON already, and moves back before it, so the next members
+        overwrite it. The file has to be opened for writing with seek, e.g. "w+".
+        """
+        position = self.fptr.tell()
+        self.close()
+        self.fptr.flush()
+        self.fptr.seek(position)
+
+
+SIMPLE_KEYS = dict()
+
+
+def simpleKey(key):
+    """
+    Attribute name of the data key, e.g. "Forces - Direction Vector" -> "Forces_Direction_Vector". The names are
+    memoized, there are only a few distinct keys even in the largest campaigns.
+    """
+    try:
+        return SIMPLE_KEYS[key]
+    except KeyError:
+        newKey = re.sub('\(|\)|\-|=', ' ', key).strip()
+        newKey = re.sub('\s+', '_', newKey)
+        SIMPLE_KEYS[key] = newKey
+        return newKey
+
+
+class Data(object):
+    """
+    Thin wrapper of the data dictionary which gives the dot member access to its keys. The nested Data objects are
+    created on demand, when the attribute is read, so wrapping even the largest campaign costs nothing.
+    """
+    __slots__ = ("data", "keyMap")
 
-        self.data = dict()
+    def __init__(self, jsonPathOrDataDict):
 
-        if type(jsonPathOrDataDict) is str:
+        if isinstance(jsonPathOrDataDict, basestring):
             with open(jsonPathOrDataDict, 'r') as fptr:
                 self.data = json.load(fptr)
-        elif type(jsonPathOrDataDict) is dict:
+        elif isinstance(jsonPathOrDataDict, collections.Mapping):
             self.data = jsonPathOrDataDict
         else:
             raise Exception("Data class constructor accepts only data dictionary or a path to a json dumped dictionary")
 
-        self.simpleKeys = []
+        # simple key -> data key, built on the first attribute access
+        self.keyMap = None
 
-        self.__construct__accssors()
+    def __getattr__(self, name):
+        # Called only when the regular attribute lookup fails, slots not yet set must not be looked up in the data
+        if name in Data.__slots__:
+            raise AttributeError(name)
 
-    def __construct__accssors(self):
-        sources = [self.data]
-        targets = [self.__dict__]
+        if self.keyMap is None:
+            self.keyMap = {simpleKey(key): key for key in self.data}
 
-        for key in self.data:
-            newKey = re.sub('\(|\)|\-|=', ' ', key).strip()
-            newKey = re.sub('\s+', '_', newKey)
+        try:
+            key = self.keyMap[name]
+        except KeyError:
+            raise AttributeError("The data has no member " + name)
 
-            self.simpleKeys.append(newKey)
+        value = self.data[key]
+        if isinstance(value, collections.Mapping):
+            return Data(value)
+        return value
 
-            if type(self.data[key]) is dict:
-                self.__dict__[newKey] = Data(self.data[key])
-            else:
-                self.__dict__[newKey] = self.data[key]
-
-        # while len(sources) > 0:
-        #     newSources = []
-        #     newTargets = []
-        #
-        #     for i, source in enumerate(sources):
-        #         target = targets[i]
-        #
-        #         for key in source:
-        #             newKey = re.sub('\(|\)|\-', ' ', key).strip()
-        #             newKey = re.sub('\s+', '_', newKey)
-        #
-        #             if type(source[key]) is dict:
-        #                 target[newKey] = dict()
-        #                 newTargets.append(target[newKey])
-        #                 newSources.append(source[key])
-        #             else:
-        #                 target[newKey] = source[key]
-        #
-        #     sources = newSources
-        #     targets = newTargets
+    def __dir__(self):
+        return sorted(set(dir(type(self)) + self.simpleKeys))
+
+    @property
+    def simpleKeys(self):
+        return [simpleKey(key) for key in self.data]
 
     def __iter__(self):
-        return self.__dict__
+        return iter(self.simpleKeys)
 
     def __getitem__(self, item):
         return self.data[item]
@@ -532,7 +1580,7 @@ class Data:
             outputFile = "output.json"
 
         with open(outputFile, 'w') as fptr:
-            json.dump(self.data, fptr, indent=4)
+            json.dump(self.data, fptr, indent=4, default=plainData)
 
     def table(self, componentName="Net"):
         mach = self.data["Log"]["farFieldConditions"]["mach"]
@@ -0,0 +1,303 @@
+"""
+Instrumentation of the parsing pipeline. While the profile is active the parsers record, for every parsed file: the
+wall time of the parser, the time spent waiting for the lines (reading and decompressing, the rest of the wall time is
+the parsing itself), the time the Parser.Prefetcher threads spent reading the file in the background, the bytes and
+the lines consumed by the parser, the number of opened files and the time spent in each ForceParser.lineProcessor
+state. The records are grouped by the case directory and by the parser (Parser.FILES name):
+
+    profile = Profiling.start()
+    parser = Parser.DirectoryParser("case_1")
+    parser.load()
+    Profiling.stop()
+    profile.dump("profile.json")
+    profile.summary()
+
+The campaign where the read time (together with the prefetch time) dominates is I/O bound (try --prefetch of
+postprocessCases.py), otherwise it is parse bound (try more --processes). With cprofile=True the whole run is also
+captured by cProfile, see saveStats(). The records are collected only in the current process, so profile the single
+process runs.
+
+When no profile is active, the hooks cost one attribute lookup per file.
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import resource
+import cProfile
+import threading
+from collections import OrderedDict, defaultdict
+
+# The profile being recorded, None when profiling is off
+active = None
+
+
+class FileRecord:
+    def __init__(self, path):
+        self.path = path
+        self.case = os.path.dirname(path)
+        self.name = None
+        self.wallTime = 0.0
+        self.readTime = 0.0
+        self.prefetchTime = 0.0
+        self.bytes = 0
+        self.lines = 0
+        self.opens = 0
+        self.states = defaultdict(float)
+
+    def asDict(self):
+        return OrderedDict([("name", self.name),
+                            ("wallTime", self.wallTime),
+                            ("readTime", self.readTime),
+                            ("prefetchTime", self.prefetchTime),
+                            ("bytes", self.bytes),
+                            ("lines", self.lines),
+                            ("opens", self.opens),
+                            ("states", OrderedDict(sorted(self.states.items(), key=lambda item: -item[1])))])
+
+
+def addRecord(total, record):
+    for key in ["wallTime", "readTime", "prefetchTime", "bytes", "lines", "opens"]:
+        total[key] = total.get(key, 0) + record[key]
+    states = total.setdefault("states", dict())
+    for state in record["states"]:
+        states[state] = states.get(state, 0.0) + record["states"][state]
+
+
+class Profile:
+    def __init__(self, cprofile=False):
+        self.records = OrderedDict()
+        self.caseTimes = OrderedDict()
+        self.lock = threading.Lock()
+        self.startTime = time.time()
+        self.wallTime = None
+        self.profiler = cProfile.Profile() if cprofile else None
+
+    def record(self, path):
+        """
+        Returns the FileRecord of the input file, the path as given to the parser (not the compressed version)
+        """
+        # The Prefetcher threads add the records concurrently
+        with self.lock:
+            if path not in self.records:
+                self.records[path] = FileRecord(path)
+            return self.records[path]
+
+    def finish(self):
+        self.wallTime = time.time() - self.startTime
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def cases(self):
+        """
+        Returns the dictionary: case directory -> totals of its files with the records of single parsers
+        """
+        cases = OrderedDict()
+        for path in sorted(self.records):
+            record = self.records[path]
+            case = cases.setdefault(record.case, OrderedDict([("parsers", OrderedDict())]))
+            data = record.asDict()
+            addRecord(case, data)
+            case["parsers"][record.name or os.path.basename(record.path)] = data
+
+        for case in cases:
+            if case in self.caseTimes:
+                # Includes also the cache and the output.json writing
+                cases[case]["wallTime"] = self.caseTimes[case]
+        return cases
+
+    def parsers(self):
+        """
+        Returns the dictionary: parser name -> totals of all its files
+        """
+        parsers = OrderedDict()
+        for path in sorted(self.records):
+            record = self.records[path]
+            total = parsers.setdefault(record.name or os.path.basename(record.path), OrderedDict([("files", 0)]))
+            total["files"] += 1
+            addRecord(total, record.asDict())
+        return parsers
+
+    def asDict(self):
+        return OrderedDict([("wallTime", self.wallTime if self.wallTime is not None else time.time() - self.startTime),
+                            ("peakMemoryMB", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.),
+                            ("parsers", self.parsers()),
+                            ("cases", self.cases())])
+
+    def dump(self, outputFile="profile.json"):
+        with open(outputFile, "w") as fptr:
+            json.dump(self.asDict(), fptr, indent=4)
+
+    def saveStats(self, outputFile):
+        """
+        Saves the cProfile statistics, to be read by pstats or e.g. snakeviz
+        """
+        if self.profiler is None:
+            raise Exception("The profile was started without cprofile=True")
+        self.profiler.dump_stats(outputFile)
+
+    def summary(self, fptr=sys.stdout, slowestCases=10, cprofileLines=20):
+        """
+        Prints the table of the parsers, their slowest lineProcessor states and the slowest cases
+        """
+        data = self.asDict()
+        total = dict()
+        for parser in data["parsers"].values():
+            addRecord(total, parser)
+
+        fptr.write("\nProfile: %.3f s total, %.3f s in parsers, %.3f s of it reading, %.3f s read in the background, "
+                   "%.1f MB peak memory\n" % (data["wallTime"], total.get("wallTime", 0.0), total.get("readTime", 0.0),
+                                             total.get("prefetchTime", 0.0), data["peakMemoryMB"]))
+        if total.get("wallTime"):
+            # The prefetched reads overlap the parsing, they are counted as if they were done in the sequence
+            readTime = total["readTime"] + total["prefetchTime"]
+            readShare = readTime / (total["wallTime"] + total["prefetchTime"])
+            fptr.write("The parsing is %s bound (%.0f%% of the parser and prefetch time spent reading)\n"
+                       % ("I/O" if readShare > 0.5 else "parse", 100 * readShare))
+
+        fptr.write("\n%-10s %6s %10s %10s %12s %10s %12s %6s %10s\n"
+                   % ("parser", "files", "wall [s]", "read [s]", "prefetch [s]", "MB", "lines", "opens", "MB/s"))
+        for name in data["parsers"]:
+            parser = data["parsers"][name]
+            megabytes = parser["bytes"] / 1e6
+            fptr.write("%-10s %6d %10.3f %10.3f %12.3f %10.2f %12d %6d %10.1f\n"
+                       % (name, parser["files"], parser["wallTime"], parser["readTime"], parser["prefetchTime"],
+                          megabytes, parser["lines"], parser["opens"],
+                          megabytes / parser["wallTime"] if parser["wallTime"] else 0.0))
+
+        if total.get("states"):
+            fptr.write("\n%-32s %10s\n" % ("lineProcessor state", "time [s]"))
+            for state, seconds in sorted(total["states"].items(), key=lambda item: -item[1]):
+                fptr.write("%-32s %10.3f\n" % (state, seconds))
+
+        cases = sorted(data["cases"].items(), key=lambda item: -item[1]["wallTime"])[:slowestCases]
+        if cases:
+            fptr.write("\n%-40s %10s %10s %12s %10s %6s\n"
+                       % ("slowest cases", "wall [s]", "read [s]", "prefetch [s]", "MB", "opens"))
+            for case, values in cases:
+                fptr.write("%-40s %10.3f %10.3f %12.3f %10.2f %6d\n"
+                           % (case[-40:], values["wallTime"], values["readTime"], values["prefetchTime"],
+                              values["bytes"] / 1e6, values["opens"]))
+
+        if self.profiler is not None and cprofileLines:
+            fptr.write("\n")
+            pstats.Stats(self.profiler, stream=fptr).sort_stats("cumulative").print_stats(cprofileLines)
+
+
+def start(cprofile=False):
+    """
+    Activates new profile and returns it
+    """
+    global active
+    active = Profile(cprofile)
+    if active.profiler is not None:
+        active.profiler.enable()
+    return active
+
+
+def stop():
+    """
+    Deactivates the profile and returns it, None when there was none
+    """
+    global active
+    profile, active = active, None
+    if profile is not None:
+        profile.finish()
+    return profile
+
+
+class Timer:
+    """
+    Adds the time of the with block to the wall time of the parser (name, path), does nothing when profiling is off
+    """
+    def __init__(self, name, path):
+        self.record = active.record(path) if active is not None else None
+        if self.record is not None:
+            self.record.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if self.record is not None:
+            self.record.wallTime += time.time() - self.start
+        return False
+
+
+class CaseTimer:
+    """
+    Records the wall time of the whole case (parsing, caching, dumping), does nothing when profiling is off
+    """
+    def __init__(self, directory):
+        self.profile = active
+        self.directory = directory
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if self.profile is not None:
+            self.profile.caseTimes[self.directory] = time.time() - self.start
+        return False
+
+
+def countOpen(path):
+    """
+    Called when the input file path (or its compressed version) is opened
+    """
+    if active is not None:
+        record = active.record(path)
+        with active.lock:
+            record.opens += 1
+
+
+def addReadTime(path, seconds, prefetched=False):
+    """
+    Adds the time of reading or decompressing the input file done outside of the line iteration, prefetched=True for
+    the reads done by the Parser.Prefetcher threads, which overlap the parsing
+    """
+    if active is not None:
+        record = active.record(path)
+        with active.lock:
+            if prefetched:
+                record.prefetchTime += seconds
+            else:
+                record.readTime += seconds
+
+
+def countLines(path, lines):
+    """
+    Returns the lines unchanged when profiling is off, otherwise the generator which counts them with their bytes and
+    measures the time spent waiting for them
+    """
+    if active is None:
+        return lines
+    return timedLines(active.record(path), lines)
+
+
+def timedLines(record, lines):
+    iterator = iter(lines)
+    while True:
+        start = time.time()
+        try:
+            line = next(iterator)
+        except StopIteration:
+            record.readTime += time.time() - start
+            return
+        record.readTime += time.time() - start
+        record.lines += 1
+        record.bytes += len(line)
+        yield line
+
+
+def lineStates(path):
+    """
+    Returns the dictionary: lineProcessor name -> seconds of the input file, None when profiling is off
+    """
+    if active is None:
+        return None
+    return active.record(path).states
@@ -0,0 +1,362 @@
+"""
+Columnar binary store of the postprocessed campaign, an alternative to the aggregated output.json. The store is a
+directory holding a small schema.json and raw .npy arrays which are memory mapped when loaded, so single coefficients
+can be fetched without reading and parsing the whole campaign:
+
+    writeStore("campaign.store", allDics)      # allDics: case name -> DirectoryParser.data
+
+    store = Store("campaign.store")
+    print store.get("case_1", "FX", "Forces", "Coefficients", "Total", "Net")
+    print store.column("Log", "farFieldConditions", "mach")     # values of all cases
+    table = store.table()                                        # Data.table columns of all cases and zones
+    print table[table["zone"] == "ster1"]["CZ_global"]
+
+The keys are the same as in the JSON data structure. Every force report (e.g. FX/"Forces - Direction Vector") is kept
+as one float64 array of shape (cases, groups, types, zones, components), where components is 3 for vector tables and
+1 for scalar ones. The additional force definitions (Direction Vector, Moment Center, ...) are kept in an array of
+shape (cases, definitions, 3). Log values are kept in the (cases, fields) and (cases, residuals) arrays. Values
+missing for some cases are stored as NaN.
+"""
+
+import os
+import json
+import collections
+import numpy as np
+from numpy.lib.format import open_memmap
+
+import Parser
+
+FORMAT_VERSION = 1
+
+SCHEMA = "schema.json"
+
+LOG_FIELDS = ["nIteration", "static_pressure", "mach", "temperature", "alpha"]
+
+# Data.table columns: (title, file, force report, vector component or None for the scalar reports)
+TABLE_COLUMNS = [("CX-global", "FX", "Forces", 0),
+                 ("CY-global", "FX", "Forces", 1),
+                 ("CZ-global", "FX", "Forces", 2),
+                 ("CMX-global", "MX", "Moments - Moment Center", 0),
+                 ("CMY-global", "MX", "Moments - Moment Center", 1),
+                 ("CMZ-global", "MX", "Moments - Moment Center", 2),
+                 ("CX-dir", "FX", "Forces - Direction Vector", None),
+                 ("CY-dir", "FY", "Forces - Direction Vector", None),
+                 ("CZ-dir", "FZ", "Forces - Direction Vector", None),
+                 ("CMX-dir", "MX", "Moments - Moment Center Moment Axis", None),
+                 ("CMY-dir", "MY", "Moments - Moment Center Moment Axis", None),
+                 ("CMZ-dir", "MZ", "Moments - Moment Center Moment Axis", None)]
+
+
+def reportItems(data):
+    """
+    Yields (fileName, forceName, report) for all force reports of the single case data. The forceName is None for
+    files with single force calculator (Parser.SINGLE_FORCE_FILES), their groups are placed directly in the file.
+    """
+    for fileName in sorted(data):
+        if fileName == "Log":
+            continue
+        if fileName in Parser.SINGLE_FORCE_FILES:
+            yield fileName, None, data[fileName]
+        else:
+            for forceName in sorted(data[fileName]):
+                yield fileName, forceName, data[fileName][forceName]
+
+
+def appendName(names, indices, name):
+    if name not in indices:
+        indices[name] = len(names)
+        names.append(name)
+    return indices[name]
+
+
+def buildSchema(cases):
+    """
+    Collects the union of all names used by the cases into the schema dictionary
+    """
+    residuals, residualIds = [], dict()
+    reports, reportIds = [], dict()
+
+    for caseName in cases:
+        data = cases[caseName]
+
+        for name in data.get("Log", dict()).get("residuals", dict()):
+            appendName(residuals, residualIds, name)
+
+        for fileName, forceName, report in reportItems(data):
+            key = (fileName, forceName)
+            if key not in reportIds:
+                reportIds[key] = len(reports)
+                reports.append({"file": fileName, "force": forceName, "array": "report%d.npy" % len(reports),
+                                "groups": [], "types": [], "zones": [], "components": 1,
+                                "definitions": [], "definitionsArray": "definitions%d.npy" % len(reports)})
+            schema = reports[reportIds[key]]
+
+            for groupName in report:
+                group = report[groupName]
+                if not isinstance(group, collections.Mapping):
+                    if groupName not in schema["definitions"]:
+                        schema["definitions"].append(groupName)
+                    continue
+
+                if groupName not in schema["groups"]:
+                    schema["groups"].append(groupName)
+                for typeName in group:
+                    if typeName not in schema["types"]:
+                        schema["types"].append(typeName)
+                    for zoneName in group[typeName]:
+                        if zoneName not in schema["zones"]:
+                            schema["zones"].append(zoneName)
+                        if isinstance(group[typeName][zoneName], list):
+                            schema["components"] = max(schema["components"], len(group[typeName][zoneName]))
+
+    return {"format": FORMAT_VERSION,
+            "parserVersion": Parser.PARSER_VERSION,
+            "cases": list(cases),
+            "caseNames": [cases[name].get("Log", dict()).get("caseName") for name in cases],
+            "log": {"array": "log.npy", "fields": LOG_FIELDS},
+            "residuals": {"array": "residuals.npy", "names": residuals},
+            "reports": reports}
+
+
+def writeStore(path, cases):
+    """
+    Writes the cases (ordered dictionary: case name -> DirectoryParser.data) into the store directory
+    """
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    schema = buildSchema(cases)
+    nCases = len(schema["cases"])
+
+    log = open_memmap(path + os.sep + schema["log"]["array"], mode="w+", dtype=np.float64,
+                      shape=(nCases, len(LOG_FIELDS)))
+    log[:] = np.nan
+    residualNames = schema["residuals"]["names"]
+    residuals = open_memmap(path + os.sep + schema["residuals"]["array"], mode="w+", dtype=np.float64,
+                            shape=(nCases, len(residualNames)))
+    residuals[:] = np.nan
+    residualIds = {name: i for i, name in enumerate(residualNames)}
+
+    arrays = dict()
+    for report in schema["reports"]:
+        array = open_memmap(path + os.sep + report["array"], mode="w+", dtype=np.float64,
+                            shape=(nCases, len(report["groups"]), len(report["types"]), len(report["zones"]),
+                                   report["components"]))
+        array[:] = np.nan
+        definitions = open_memmap(path + os.sep + report["definitionsArray"], mode="w+", dtype=np.float64,
+                                  shape=(nCases, len(report["definitions"]), 3))
+        definitions[:] = np.nan
+        indices = [{name: i for i, name in enumerate(report[axis])}
+                   for axis in ("groups", "types", "zones", "definitions")]
+        arrays[(report["file"], report["force"])] = array, definitions, indices
+
+    for caseId, caseName in enumerate(schema["cases"]):
+        data = cases[caseName]
+
+        logData = data.get("Log", dict())
+        farField = logData.get("farFieldConditions", dict())
+        for fieldId, field in enumerate(LOG_FIELDS):
+            value = logData.get(field, farField.get(field))
+            if value is not None:
+                log[caseId, fieldId] = value
+        for name, value in logData.get("residuals", dict()).items():
+            residuals[caseId, residualIds[name]] = value
+
+        for fileName, forceName, report in reportItems(data):
+            array, definitions, (groupIds, typeIds, zoneIds, definitionIds) = arrays[(fileName, forceName)]
+            for groupName in report:
+                group = report[groupName]
+                if not isinstance(group, collections.Mapping):
+                    definitions[caseId, definitionIds[groupName], :len(group)] = group
+                    continue
+                for typeName in group:
+                    forceType = group[typeName]
+                    for zoneName in forceType:
+                        array[caseId, groupIds[groupName], typeIds[typeName], zoneIds[zoneName]] = forceType[zoneName]
+
+    for array in [log, residuals] + [a for pair in arrays.values() for a in pair[:2]]:
+        array.flush()
+
+    with open(path + os.sep + SCHEMA, "w") as fptr:
+        json.dump(schema, fptr, indent=4)
+
+
+class Store:
+    def __init__(self, path):
+        self.path = path
+
+        with open(path + os.sep + SCHEMA, "r") as fptr:
+            self.schema = json.load(fptr)
+
+        if self.schema["format"] != FORMAT_VERSION:
+            raise Exception("The store " + path + " has unsupported format version " + str(self.schema["format"]))
+
+        self.cases = self.schema["cases"]
+        self.caseIds = {name: i for i, name in enumerate(self.cases)}
+
+        self.reports = dict()
+        for report in self.schema["reports"]:
+            self.reports[(report["file"], report["force"])] = report
+
+        self.arrays = dict()
+
+    def array(self, fileName):
+        # Arrays are memory mapped on the first use, only the touched pages are read from the disk
+        if fileName not in self.arrays:
+            self.arrays[fileName] = np.load(self.path + os.sep + fileName, mmap_mode="r")
+        return self.arrays[fileName]
+
+    def caseIndex(self, caseName):
+        return self.caseIds[caseName]
+
+    def report(self, fileName, forceName=None):
+        """
+        Returns (array, report schema) of single force report. The array has shape (cases, groups, types, zones,
+        components) and the names of the axes are listed in the report schema.
+        """
+        report = self.reports[(fileName, forceName)]
+        return self.array(report["array"]), report
+
+    def column(self, *keys):
+        """
+        Values of all cases for the data path given as in the JSON structure, e.g.
+        column("FX", "Forces", "Coefficients", "Total", "Net") or column("Log", "residuals", "continuity")
+        """
+        keys = list(keys)
+        fileName = keys.pop(0)
+
+        if fileName == "Log":
+            if keys[0] == "caseName":
+                return self.schema["caseNames"]
+            if keys[0] == "residuals":
+                names = self.schema["residuals"]["names"]
+                return self.array(self.schema["residuals"]["array"])[:, names.index(keys[1])]
+            return self.array(self.schema["log"]["array"])[:, LOG_FIELDS.index(keys[-1])]
+
+        forceName = None if fileName in Parser.SINGLE_FORCE_FILES else keys.pop(0)
+        report = self.reports[(fileName, forceName)]
+
+        if keys[0] in report["definitions"]:
+            return self.array(report["definitionsArray"])[:, report["definitions"].index(keys[0])]
+
+        groupName, typeName, zoneName = keys
+        values = self.array(report["array"])[:, report["groups"].index(groupName), report["types"].index(typeName),
+                                             report["zones"].index(zoneName)]
+        if report["components"] == 1:
+            return values[:, 0]
+        return values
+
+    def table(self, zones=None, groupName="Coefficients", typeName="Total"):
+        """
+        The Data.table of all cases and zones at once, as the structured array with one record per case and zone
+        (case-major): name, zone, mach, alpha and the coefficients named as Data attributes (e.g. CX_global). The
+        zones default to all zones found in the force reports, the values missing for a case or zone are NaN.
+        """
+        columns = [(title, self.reports.get((fileName, forceName)), component)
+                   for title, fileName, forceName, component in TABLE_COLUMNS]
+
+        if zones is None:
+            zones = []
+            for title, report, component in columns:
+                for zoneName in (report["zones"] if report is not None else []):
+                    if zoneName not in zones:
+                        zones.append(zoneName)
+
+        nCases, nZones = len(self.cases), len(zones)
+        dtype = [("name", "S%d" % max([len(name) for name in self.cases] + [1])),
+                 ("zone", "S%d" % max([len(zone) for zone in zones] + [1])),
+                 ("mach", np.float64),
+                 ("alpha", np.float64)]
+        dtype += [(Parser.simpleKey(title), np.float64) for title, report, component in columns]
+
+        array = np.empty(nCases * nZones, dtype=dtype)
+        array["name"] = np.repeat(self.cases, nZones)
+        array["zone"] = np.tile(zones, nCases)
+        log = self.array(self.schema["log"]["array"])
+        for field in ["mach", "alpha"]:
+            array[field] = np.repeat(log[:, LOG_FIELDS.index(field)], nZones)
+
+        for title, report, component in columns:
+            key = Parser.simpleKey(title)
+            if report is None or groupName not in report["groups"] or typeName not in report["types"]:
+                array[key] = np.nan
+                continue
+
+            # One gather of the (cases, zones) block, the zones missing in the report are filled with NaN afterwards
+            zoneIds = np.array([report["zones"].index(zone) if zone in report["zones"] else -1 for zone in zones],
+                               dtype=np.intp)
+            values = self.array(report["array"])[:, report["groups"].index(groupName),
+                                                 report["types"].index(typeName), :, component or 0]
+            values = np.where(zoneIds < 0, np.nan, values[:, np.maximum(zoneIds, 0)])
+            array[key] = values.reshape(-1)
+
+        return array
+
+    def get(self, caseName, *keys):
+        """
+        Single value of the case, e.g. get("case_1", "MX", "Moments - Moment Center", "Coefficients", "Total", "Net")
+        """
+        value = self.column(*keys)[self.caseIndex(caseName)]
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        return value
+
+    def toDict(self, caseName):
+        """
+        Rebuilds the data dictionary of single case, as produced by the DirectoryParser
+        """
+        caseId = self.caseIndex(caseName)
+        data = dict()
+
+        log = dict()
+        logValues = self.array(self.schema["log"]["array"])[caseId]
+        farField = dict()
+        for fieldId, field in enumerate(LOG_FIELDS):
+            if np.isnan(logValues[fieldId]):
+                continue
+            if field == "nIteration":
+                log[field] = int(logValues[fieldId])
+            else:
+                farField[field] = float(logValues[fieldId])
+        if farField:
+            log["farFieldConditions"] = farField
+        residualValues = self.array(self.schema["residuals"]["array"])[caseId]
+        residuals = {name: float(residualValues[i]) for i, name in enumerate(self.schema["residuals"]["names"])
+                     if not np.isnan(residualValues[i])}
+        if residuals:
+            log["residuals"] = residuals
+        if self.schema["caseNames"][caseId] is not None:
+            log["caseName"] = self.schema["caseNames"][caseId]
+        if log:
+            data["Log"] = log
+
+        for report in self.schema["reports"]:
+            values = self.array(report["array"])[caseId]
+            definitions = self.array(report["definitionsArray"])[caseId]
+
+            reportDict = dict()
+            for definitionId, definitionName in enumerate(report["definitions"]):
+                if not np.isnan(definitions[definitionId, 0]):
+                    reportDict[definitionName] = definitions[definitionId].tolist()
+            for groupId, groupName in enumerate(report["groups"]):
+                group = dict()
+                for typeId, typeName in enumerate(report["types"]):
+                    forceType = dict()
+                    for zoneId, zoneName in enumerate(report["zones"]):
+                        value = values[groupId, typeId, zoneId]
+                        if np.isnan(value[0]):
+                            continue
+                        forceType[zoneName] = float(value[0]) if report["components"] == 1 else value.tolist()
+                    if forceType:
+                        group[typeName] = forceType
+                if group:
+                    reportDict[groupName] = group
+
+            if not reportDict:
+                continue
+            if report["force"] is None:
+                data[report["file"]] = reportDict
+            else:
+                data.setdefault(report["file"], dict())[report["force"]] = reportDict
+
+        return data
@@ -0,0 +1,186 @@
+"""
+Generator of synthetic, but realistic Fluent outputs: fluent_log.log with the residual history and the force reports
+FX, FY, FZ, MX, MY, MZ, CoPy and CoPz, in the same layout as the files in "specification/VISCID BLOCK - surowe".
+The files are used to measure the parsers performance (see benchmarkParsers.py) on campaigns of any size:
+
+    python SyntheticCases.py /tmp/campaign --cases 100 --zones 200 --iterations 10000
+
+Each generated case directory can be processed with Parser.DirectoryParser or postprocessCases.py.
+"""
+
+import os
+import math
+import random
+import argparse
+
+import Parser
+
+RESIDUAL_NAMES = ["continuity", "x-velocity", "y-velocity", "z-velocity", "energy", "k", "omega",
+                  "cm-1-res", "Cm-1", "cy-1-res", "Cl-2", "cl-1-res", "Cl-1", "cd-1-res", "Cd-1"]
+
+ZONE_NAMES = ["gardziel_dyszy", "glowica", "korpus", "ster1", "ster2", "ster3", "ster4", "tail", "zapalnik"]
+
+MOMENT_CENTER = (-1.1323, 0, 0)
+
+
+def residualNames(nColumns):
+    names = RESIDUAL_NAMES[:nColumns]
+    names += ["res-%d" % i for i in range(len(names), nColumns)]
+    return names
+
+
+def zoneNames(nZones):
+    names = ZONE_NAMES[:nZones]
+    names += ["wall_%d" % i for i in range(len(names), nZones)]
+    return names
+
+
+def writeLog(path, caseName, nIterations=10000, nResiduals=15, mach=1.1, alpha=0.0, headerEvery=11, seed=0):
+    rnd = random.Random(seed)
+    names = residualNames(nResiduals)
+    header = "  iter" + "".join("%12s" % name for name in names) + "     time/iter\n"
+
+    dirX = math.cos(math.radians(alpha))
+    dirZ = math.sin(math.radians(alpha))
+
+    with open(path, "w") as fptr:
+        fptr.write("/tools/ansys/v150/fluent/fluent15.0.0/bin/fluent -r15.0.0 -p -g 3ddp -t36 -cnf=pnodes "
+                   "-i %s.jou -mpi=openmpi\n" % caseName)
+        fptr.write("\n     Welcome to ANSYS Fluent 15.0.0\n\n")
+        fptr.write("Reading journal file %s.jou...\n\n" % caseName)
+        fptr.write("> /define/boundary-conditions/pressure-far-field (pressurefarfield)\n")
+        fptr.write("pressurefarfield no 89875. no %.2f no 281.65 yes no %.8g no 0 no %.8g no no yes 0.1 50. \n\n"
+                   % (mach, dirX, dirZ))
+        fptr.write("> /report/reference-values/compute/pressure-far-field (pressurefarfield)\npressurefarfield \n\n")
+        fptr.write("> /solve/initialize/initialize-flow\n\n")
+        fptr.write("> /solve/iterate %d\n\n" % nIterations)
+
+        fptr.write("Creating multigrid levels... \n")
+        for level in range(6):
+            fptr.write(" Grid Level %2d: %6d cells, %8d faces, 7612038 nodes;  36 clusters\n"
+                       % (level, 7516704 >> (2 * level), 22645527 >> level))
+        fptr.write("Done.\n\n\nFMG: Converge FAS on level 5 [eps = 0.001000, max-iter=1000]\n")
+        for i in range(10):
+            fptr.write(".......... -> Normalized residual = %g \n" % rnd.uniform(0.001, 0.3))
+        fptr.write(" FMG: FAS converged.\n\n")
+
+        values = [1.0] * len(names)
+        for iteration in range(1, nIterations + 1):
+            if (iteration - 1) % headerEvery == 0:
+                fptr.write(header)
+            values = [value * rnd.uniform(0.99, 1.0) for value in values]
+            remaining = nIterations - iteration
+            fptr.write("%6d" % iteration + "".join("%12.4e" % value for value in values) +
+                       " %d:%02d:%02d %5d\n" % (remaining / 3600, remaining / 60 % 60, remaining % 60, remaining))
+
+        fptr.write("\n")
+        for name in Parser.FILES:
+            if name != "Log":
+                fptr.write("> /report/forces/wall-forces yes 1 0 0 yes \"%s\" \n\n" % name)
+        fptr.write("> wc %s.cas\n\nWriting \"%s.cas\"...\nDone.\n\n" % (caseName, caseName))
+        fptr.write("> wd %s.dat\n\nWriting \"%s.dat\"...\nDone.\n\n" % (caseName, caseName))
+        fptr.write("> exit\n")
+
+
+def formatVector(vector):
+    return "(" + " ".join("%.8g" % value for value in vector) + ")"
+
+
+def writeTable(fptr, groups, types, zones, vector, rnd):
+    """
+    Writes single zone table, groups e.g. ["Forces (n)", "Coefficients"], types e.g. ["Pressure", "Viscous", "Total"]
+    """
+    width = 46 if vector else 16
+    nColumns = len(groups) * len(types)
+
+    fptr.write(" " * 26 + "".join("%-*s" % (width * len(types), group) for group in groups) + "\n")
+    fptr.write("%-26s" % "Zone" + "".join("%-*s" % (width, name) for group in groups for name in types) + "\n")
+
+    net = [[0.0] * 3 for i in range(nColumns)]
+    for zone in zones:
+        row = "%-26s" % zone
+        for column in range(nColumns):
+            value = [rnd.uniform(-100, 100) for i in range(3)]
+            net[column] = [a + b for a, b in zip(net[column], value)]
+            row += "%-*s" % (width, (formatVector(value) if vector else "%.8g" % value[0]) + " ")
+        fptr.write(row + "\n")
+
+    fptr.write("-" * 25 + (" " + "-" * (width - 1)) * nColumns + "\n")
+    fptr.write("%-26s" % "Net" + "".join("%-*s" % (width, (formatVector(value) if vector else "%.8g" % value[0]) + " ")
+                                         for value in net) + "\n\n")
+
+
+def writeForceReport(path, name, zones, seed=0):
+    rnd = random.Random("%s-%d" % (name, seed))
+    types = ["Pressure", "Viscous", "Total"]
+
+    with open(path, "w") as fptr:
+        fptr.write(" " * 36 + "\"Force Report\"\n\n")
+
+        if name.startswith("CoP"):
+            axis = name[-1]
+            fptr.write("Center of Pressure - Set Coordinate %s = 0 (m)\n" % axis)
+            fptr.write("%-26s" % "Zone" + "".join("%-16s" % t for t in "xyz".replace(axis, "")) + "\n")
+            for zone in zones + ["Net"]:
+                if zone == "Net":
+                    fptr.write("-" * 25 + (" " + "-" * 15) * 2 + "\n")
+                fptr.write("%-26s" % zone + "".join("%-16.8g" % rnd.uniform(-3, 3) for i in range(2)) + "\n")
+            return
+
+        direction = [0, 0, 0]
+        direction["XYZ".index(name[-1])] = 1
+        if name.startswith("F"):
+            fptr.write("Forces\n")
+            writeTable(fptr, ["Forces (n)", "Coefficients"], types, zones, True, rnd)
+            fptr.write("Forces - Direction Vector %s\n" % formatVector(direction))
+            writeTable(fptr, ["Forces (n)", "Coefficients"], types, zones, False, rnd)
+        else:
+            fptr.write("Moments - Moment Center %s\n" % formatVector(MOMENT_CENTER))
+            writeTable(fptr, ["Moments (n-m)", "Coefficients"], types, zones, True, rnd)
+            fptr.write("Moments - Moment Center %s Moment Axis %s\n"
+                       % (formatVector(MOMENT_CENTER), formatVector(direction)))
+            writeTable(fptr, ["Moments (n-m)", "Coefficients"], types, zones, False, rnd)
+
+
+def writeCase(directory, nZones=9, nIterations=10000, nResiduals=15, mach=1.1, alpha=0.0, seed=0):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    caseName = os.path.basename(os.path.normpath(directory))
+    zones = zoneNames(nZones)
+
+    for name in Parser.FILES:
+        path = directory + os.sep + Parser.FILES[name]
+        if name == "Log":
+            writeLog(path, caseName, nIterations, nResiduals, mach, alpha, seed=seed)
+        else:
+            writeForceReport(path, name, zones, seed=seed)
+
+
+def writeCampaign(root, nCases=10, nZones=9, nIterations=10000, nResiduals=15, seed=0):
+    """
+    Writes nCases case directories into the root, the cases are spread over the Mach and alpha ranges.
+    Returns the list of case directories.
+    """
+    directories = []
+    for caseId in range(nCases):
+        directory = root + os.sep + "case_%d" % caseId
+        mach = 1.1 + 0.1 * (caseId % 30)
+        alpha = 2.0 * (caseId / 30 % 10)
+        writeCase(directory, nZones, nIterations, nResiduals, mach, alpha, seed + caseId)
+        directories.append(directory)
+
+    return directories
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Write synthetic Fluent case directories")
+    argParser.add_argument("root", help="campaign directory")
+    argParser.add_argument("--cases", type=int, default=10, help="number of case directories")
+    argParser.add_argument("--zones", type=int, default=9, help="number of wall zones in the force reports")
+    argParser.add_argument("--iterations", type=int, default=10000, help="number of iterations in the log")
+    argParser.add_argument("--residuals", type=int, default=15, help="number of residual columns in the log")
+    argParser.add_argument("--seed", type=int, default=0)
+    args = argParser.parse_args()
+
+    writeCampaign(args.root, args.cases, args.zones, args.iterations, args.residuals, args.seed)
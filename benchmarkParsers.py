@@ -0,0 +1,186 @@
+"""
+Benchmark of the postprocessing pipeline on the synthetic campaign (see SyntheticCases.py). Times LogParser,
+ForceParser, DirectoryParser.load, Data construction with the table() projection and writeCSV, and reports the
+throughput in MB/s and cases/s together with the peak memory. Every benchmark runs in a fresh process, so the peak
+memory of one doesn't hide the other.
+
+    python benchmarkParsers.py --cases 50 --zones 100 --save-baseline benchmark_baseline.json
+    python benchmarkParsers.py --cases 50 --zones 100 --baseline benchmark_baseline.json
+
+When the baseline is given, the benchmarks slower (or taking more memory) than the baseline by more than the
+--tolerance are reported as regressions and the script exits with status 1.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from StringIO import StringIO
+
+import Parser
+import SyntheticCases
+
+
+def fileSize(directories, names):
+    return sum(os.path.getsize(directory + os.sep + Parser.FILES[name]) for directory in directories for name in names)
+
+
+def benchmarkLogParser(directories):
+    for directory in directories:
+        Parser.LogParser(directory + os.sep + Parser.FILES["Log"]).parse()
+    return fileSize(directories, ["Log"])
+
+
+def benchmarkForceParser(directories):
+    names = [name for name in Parser.FILES if name != "Log"]
+    for directory in directories:
+        for name in names:
+            Parser.createParser(name, directory + os.sep + Parser.FILES[name]).parse()
+    return fileSize(directories, names)
+
+
+def benchmarkDirectoryParser(directories):
+    for directory in directories:
+        Parser.DirectoryParser(directory).load()
+    return fileSize(directories, Parser.FILES)
+
+
+def benchmarkData(directories):
+    jsonPath = os.path.dirname(directories[0]) + os.sep + "output.json"
+    data = Parser.Data(jsonPath)
+    for name in data.data:
+        Parser.Data(data.data[name]).table("Net")
+    return os.path.getsize(jsonPath)
+
+
+def benchmarkWriteCSV(directories):
+    row = [0.123456789] * 14
+    rows = [row] * len(directories)
+    fptr = StringIO()
+    Parser.writeCSV(fptr, ["column"] * len(row), rows)
+    return fptr.tell()
+
+
+BENCHMARKS = [("LogParser", benchmarkLogParser),
+              ("ForceParser", benchmarkForceParser),
+              ("DirectoryParser.load", benchmarkDirectoryParser),
+              ("Data", benchmarkData),
+              ("writeCSV", benchmarkWriteCSV)]
+
+
+def runBenchmark(nameAndDirectories):
+    """
+    Runs single benchmark in the pool worker, returns (seconds, bytes processed, peak memory increase in MB)
+    """
+    name, directories = nameAndDirectories
+    function = dict(BENCHMARKS)[name]
+
+    startMemory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    nBytes = function(directories)
+    seconds = time.time() - start
+    peakMemory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - startMemory
+
+    return seconds, nBytes, peakMemory / 1024.0
+
+
+def runBenchmarks(directories, repeat=3):
+    results = []
+    for name, function in BENCHMARKS:
+        runs = []
+        for i in range(repeat):
+            pool = multiprocessing.Pool(1)
+            runs.append(pool.apply(runBenchmark, ((name, directories),)))
+            pool.close()
+            pool.join()
+
+        seconds = min(run[0] for run in runs)
+        nBytes = runs[0][1]
+        results.append({"name": name,
+                        "seconds": seconds,
+                        "MBps": nBytes / 1024.0 ** 2 / seconds if seconds > 0 else float("inf"),
+                        "casesps": len(directories) / seconds if seconds > 0 else float("inf"),
+                        "peakMemoryMB": max(run[2] for run in runs)})
+    return results
+
+
+def compareWithBaseline(results, baseline, tolerance):
+    """
+    Returns the list of regression messages
+    """
+    regressions = []
+    baselineResults = {result["name"]: result for result in baseline["results"]}
+    for result in results:
+        reference = baselineResults.get(result["name"])
+        if reference is None:
+            continue
+        if result["seconds"] > reference["seconds"] * (1 + tolerance):
+            regressions.append("%s: %.3f s, baseline %.3f s" % (result["name"], result["seconds"], reference["seconds"]))
+        # Memory below 1 MB is dominated by the measurement noise
+        if result["peakMemoryMB"] > max(reference["peakMemoryMB"] * (1 + tolerance), 1.0):
+            regressions.append("%s: peak memory %.1f MB, baseline %.1f MB"
+                               % (result["name"], result["peakMemoryMB"], reference["peakMemoryMB"]))
+    return regressions
+
+
+def printResults(results):
+    print "%-22s %10s %10s %10s %12s" % ("benchmark", "time [s]", "MB/s", "cases/s", "peak mem [MB]")
+    for result in results:
+        print "%-22s %10.3f %10.1f %10.1f %12.1f" % (result["name"], result["seconds"], result["MBps"],
+                                                   result["casesps"], result["peakMemoryMB"])
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Benchmark the parsers on synthetic Fluent outputs")
+    argParser.add_argument("--cases", type=int, default=20, help="number of synthetic case directories")
+    argParser.add_argument("--zones", type=int, default=9, help="number of wall zones in the force reports")
+    argParser.add_argument("--iterations", type=int, default=10000, help="number of iterations in the logs")
+    argParser.add_argument("--residuals", type=int, default=15, help="number of residual columns in the logs")
+    argParser.add_argument("--repeat", type=int, default=3, help="the best time of repeated runs is reported")
+    argParser.add_argument("--workdir", help="directory for the synthetic campaign, temporary one by default")
+    argParser.add_argument("--baseline", help="JSON file with the baseline results to compare with")
+    argParser.add_argument("--save-baseline", metavar="PATH", help="save the results as the new baseline")
+    argParser.add_argument("--tolerance", type=float, default=0.25,
+                           help="allowed relative slowdown or memory growth before reporting a regression")
+    args = argParser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="fluent-benchmark-")
+    try:
+        directories = SyntheticCases.writeCampaign(workdir, args.cases, args.zones, args.iterations, args.residuals)
+
+        allDics = dict()
+        for directory in directories:
+            parser = Parser.DirectoryParser(directory)
+            parser.load()
+            allDics[os.path.basename(directory)] = parser.data
+        with open(workdir + os.sep + "output.json", "w") as fptr:
+            json.dump(allDics, fptr, default=Parser.plainData)
+
+        results = runBenchmarks(directories, args.repeat)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir)
+
+    printResults(results)
+
+    setup = {"cases": args.cases, "zones": args.zones, "iterations": args.iterations, "residuals": args.residuals}
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fptr:
+            json.dump({"setup": setup, "results": results}, fptr, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r") as fptr:
+            baseline = json.load(fptr)
+        if baseline["setup"] != setup:
+            print "WARNING! the baseline was measured for different setup: " + json.dumps(baseline["setup"])
+        regressions = compareWithBaseline(results, baseline, args.tolerance)
+        if regressions:
+            print "\nRegressions against " + args.baseline + ":\n    " + "\n    ".join(regressions)
+            sys.exit(1)
+        print "\nNo regressions against " + args.baseline
@@ -0,0 +1,240 @@
+"""
+Compares the coefficients of two postprocessed campaigns, e.g. the coarse and the fine mesh, or the solver setting
+before and after the change. Both campaigns are flattened into the tables of Data.table coefficients of every case and
+zone (see Store.table), the cases are matched by the case directory name, or with --match-conditions by the far field
+(mach, alpha), and all differences are computed at once. The cases sharing the key with another case of the same
+campaign are reported as ambiguous and not compared. The value fails when |b - a| > atol + rtol * |a|, the same
+test as numpy.isclose:
+
+    python compareCampaigns.py coarse/output.json fine/output.json --rtol 0.01 --column-rtol CMY_global=0.05
+
+The campaigns are given as the aggregated output.json or the Store directory, which is much faster for the large
+campaigns, as only the coefficient arrays are read instead of parsing the whole JSON. The worst offender of every zone
+and coefficient is printed, --csv writes all failing values. The exit status is 1 when any value fails.
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+import numpy as np
+
+import Parser
+import Store
+
+# Rounding of the (mach, alpha) when matching by the conditions
+DECIMALS = 6
+
+
+def flattenCases(cases, zones=None):
+    """
+    The structured array of Store.table built from the cases (dictionary: case name -> DirectoryParser.data), values
+    missing in the data are NaN
+    """
+    names = sorted(cases)
+    if zones is None:
+        zones = []
+        for name in names:
+            for title, fileName, forceName, component in Store.TABLE_COLUMNS:
+                try:
+                    zoneNames = cases[name][fileName][forceName]["Coefficients"]["Total"]
+                except (KeyError, TypeError):
+                    continue
+                for zoneName in zoneNames:
+                    if zoneName not in zones:
+                        zones.append(zoneName)
+
+    nZones = len(zones)
+    zoneIds = {zone: i for i, zone in enumerate(zones)}
+    columns = [Parser.simpleKey(title) for title, fileName, forceName, component in Store.TABLE_COLUMNS]
+
+    dtype = [("name", "S%d" % max([len(name) for name in names] + [1])),
+             ("zone", "S%d" % max([len(zone) for zone in zones] + [1])),
+             ("mach", np.float64),
+             ("alpha", np.float64)]
+    dtype += [(column, np.float64) for column in columns]
+
+    values = np.empty((len(names), len(columns) + 2, nZones))
+    values[:] = np.nan
+    for caseId, name in enumerate(names):
+        data = cases[name]
+        farField = data.get("Log", dict()).get("farFieldConditions", dict())
+        values[caseId, 0] = farField.get("mach", np.nan)
+        values[caseId, 1] = farField.get("alpha", np.nan)
+
+        for columnId, (title, fileName, forceName, component) in enumerate(Store.TABLE_COLUMNS):
+            try:
+                forceType = data[fileName][forceName]["Coefficients"]["Total"]
+            except (KeyError, TypeError):
+                continue
+            for zoneName in forceType:
+                if zoneName in zoneIds:
+                    value = forceType[zoneName]
+                    values[caseId, columnId + 2, zoneIds[zoneName]] = value if component is None else value[component]
+
+    array = np.empty(len(names) * nZones, dtype=dtype)
+    array["name"] = np.repeat(names, nZones)
+    array["zone"] = np.tile(zones, len(names))
+    for columnId, column in enumerate(["mach", "alpha"] + columns):
+        array[column] = values[:, columnId].reshape(-1)
+    return array
+
+
+def loadTable(source):
+    """
+    Flattened table of the campaign given as the aggregated output.json or the Store directory
+    """
+    if os.path.isdir(source):
+        return Store.Store(source).table()
+    with open(source, "r") as fptr:
+        return flattenCases(json.load(fptr))
+
+
+def matchKeys(table, byConditions):
+    if byConditions:
+        return zip(np.round(table["mach"], DECIMALS) + 0.0, np.round(table["alpha"], DECIMALS) + 0.0, table["zone"])
+    return zip(table["name"], table["zone"])
+
+
+def keyRows(keys):
+    """
+    Returns (dictionary: key -> row index, set of the keys found in more rows)
+    """
+    rows, repeated = dict(), set()
+    for i, key in enumerate(keys):
+        if key in rows:
+            repeated.add(key)
+        rows[key] = i
+    return rows, repeated
+
+
+def alignTables(a, b, byConditions=False):
+    """
+    Returns the row indices (ia, ib) of the matching records of the tables, the case names found only in a and only
+    in b, and the ambiguous case names of a and of b. The case is ambiguous when its key repeats in either table (e.g.
+    two cases of the same (mach, alpha)), such cases are not matched.
+    """
+    keysA, keysB = matchKeys(a, byConditions), matchKeys(b, byConditions)
+    rowsA, repeatedA = keyRows(keysA)
+    rowsB, repeatedB = keyRows(keysB)
+    repeated = repeatedA | repeatedB
+
+    ia, ib = [], []
+    for i, key in enumerate(keysA):
+        if key in rowsB and key not in repeated:
+            ia.append(i)
+            ib.append(rowsB[key])
+
+    ambiguousA = set(name for name, key in zip(a["name"], keysA) if key in repeated)
+    ambiguousB = set(name for name, key in zip(b["name"], keysB) if key in repeated)
+
+    ia, ib = np.array(ia, dtype=np.intp), np.array(ib, dtype=np.intp)
+    onlyA = sorted(set(a["name"]) - set(a["name"][ia]) - ambiguousA)
+    onlyB = sorted(set(b["name"]) - set(b["name"][ib]) - ambiguousB)
+    return ia, ib, onlyA, onlyB, sorted(ambiguousA), sorted(ambiguousB)
+
+
+def compareTables(a, b, ia, ib, columns, rtol=1e-3, atol=1e-6, columnRtol=None):
+    """
+    Returns (values a, values b, absolute differences, relative differences, failed mask), all of shape
+    (matched records, columns). The relative difference is related to |a|, both NaN counts as equal and single NaN
+    as failure.
+    """
+    valuesA = np.column_stack([a[column][ia] for column in columns])
+    valuesB = np.column_stack([b[column][ib] for column in columns])
+
+    rtols = np.array([(columnRtol or dict()).get(column, rtol) for column in columns])
+    difference = valuesB - valuesA
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = np.abs(difference) / np.abs(valuesA)
+        failed = np.abs(difference) > atol + rtols * np.abs(valuesA)
+
+    nanA, nanB = np.isnan(valuesA), np.isnan(valuesB)
+    failed |= nanA != nanB
+    relative[nanA != nanB] = np.inf
+    relative[nanA & nanB] = 0.0
+    return valuesA, valuesB, difference, relative, failed
+
+
+def worstOffenders(zones, columns, relative, failed):
+    """
+    Returns the list of (zone, column, record index, failures) with the largest relative difference among the failing
+    values of every zone and column, ordered from the worst one
+    """
+    offenders = []
+    for zone in sorted(set(zones)):
+        zoneRows = np.nonzero(zones == zone)[0]
+        for columnId, column in enumerate(columns):
+            zoneFailed = failed[zoneRows, columnId]
+            if not zoneFailed.any():
+                continue
+            candidates = zoneRows[zoneFailed]
+            worst = candidates[np.argmax(relative[candidates, columnId])]
+            offenders.append((zone, column, worst, int(zoneFailed.sum())))
+    offenders.sort(key=lambda offender: -relative[offender[2], columns.index(offender[1])])
+    return offenders
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Compare the coefficients of two postprocessed campaigns")
+    argParser.add_argument("a", help="reference campaign: output.json or Store directory")
+    argParser.add_argument("b", help="compared campaign: output.json or Store directory")
+    argParser.add_argument("--match-conditions", action="store_true",
+                           help="match the cases by (mach, alpha) instead of the case directory name")
+    argParser.add_argument("--rtol", type=float, default=1e-3, help="relative tolerance")
+    argParser.add_argument("--atol", type=float, default=1e-6, help="absolute tolerance")
+    argParser.add_argument("--column-rtol", action="append", default=[], metavar="COLUMN=RTOL",
+                           help="relative tolerance of single coefficient, e.g. CMY_global=0.05")
+    argParser.add_argument("--csv", metavar="PATH", help="write all failing values into the CSV file")
+    args = argParser.parse_args()
+
+    columnRtol = dict()
+    for argument in args.column_rtol:
+        column, value = argument.split("=", 1)
+        columnRtol[column] = float(value)
+
+    tableA, tableB = loadTable(args.a), loadTable(args.b)
+    columns = [column for column in tableA.dtype.names if column not in ("name", "zone", "mach", "alpha")]
+    unknown = set(columnRtol) - set(columns)
+    if unknown:
+        raise Exception("Unknown columns " + ", ".join(sorted(unknown)) + ", available: " + ", ".join(columns))
+
+    ia, ib, onlyA, onlyB, ambiguousA, ambiguousB = alignTables(tableA, tableB, args.match_conditions)
+    valuesA, valuesB, difference, relative, failed = compareTables(tableA, tableB, ia, ib, columns, args.rtol,
+                                                                   args.atol, columnRtol)
+
+    print "%d cases matched, %d only in %s, %d only in %s, %d ambiguous" \
+          % (len(set(tableA["name"][ia])), len(onlyA), args.a, len(onlyB), args.b,
+             len(ambiguousA) + len(ambiguousB))
+    for label, names in [(args.a, onlyA), (args.b, onlyB)]:
+        if names:
+            print "Only in " + label + ": " + ", ".join(names)
+    key = "(mach, alpha)" if args.match_conditions else "name"
+    for label, names in [(args.a, ambiguousA), (args.b, ambiguousB)]:
+        if names:
+            print "Ambiguous " + key + ", not compared, in " + label + ": " + ", ".join(names)
+    print "%d of %d values differ more than the tolerance" % (failed.sum(), failed.size)
+
+    zones = tableA["zone"][ia]
+    offenders = worstOffenders(zones, columns, relative, failed)
+    if offenders:
+        print "\n%-16s %-12s %6s %-24s %14s %14s %14s %10s" \
+              % ("zone", "coefficient", "failed", "worst case", "a", "b", "b - a", "relative")
+        for zone, column, row, count in offenders:
+            columnId = columns.index(column)
+            print "%-16s %-12s %6d %-24s %14.6e %14.6e %14.6e %10.3e" \
+                  % (zone, column, count, tableA["name"][ia[row]][-24:], valuesA[row, columnId],
+                     valuesB[row, columnId], difference[row, columnId], relative[row, columnId])
+
+    if args.csv:
+        with open(args.csv, "w") as fptr:
+            writer = csv.writer(fptr, lineterminator="\n")
+            writer.writerow(["a", "b", "zone", "coefficient", "value a", "value b", "difference", "relative"])
+            for row, columnId in zip(*np.nonzero(failed)):
+                writer.writerow([tableA["name"][ia[row]], tableB["name"][ib[row]], zones[row], columns[columnId],
+                                 repr(valuesA[row, columnId]), repr(valuesB[row, columnId]),
+                                 repr(difference[row, columnId]), repr(relative[row, columnId])])
+
+    if failed.any():
+        sys.exit(1)
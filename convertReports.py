@@ -0,0 +1,62 @@
+"""
+Converts the directory of consolidated report files (e.g. "specification/VISCID BLOCK - wyniki", see
+Parser.ReportParser) into one structured array saved as .npy, and optionally into the CSV table and the JSON data:
+
+    python convertReports.py "specification/VISCID BLOCK - wyniki" reports.npy --csv reports.csv --json reports.json
+
+The array is read back with numpy.load("reports.npy"), the records hold the case description (name, mesh, flags,
+alpha, mach, rotation, nIteration), the Data.table coefficients and the COP coordinates.
+"""
+
+import csv
+import sys
+import argparse
+import numpy as np
+
+import Parser
+import Profiling
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Convert the consolidated Fluent reports into structured array")
+    argParser.add_argument("directory", help="directory with the report *.txt files")
+    argParser.add_argument("output", help="output .npy file")
+    argParser.add_argument("--csv", metavar="PATH", help="write also the CSV table")
+    argParser.add_argument("--json", metavar="PATH", help="write also the JSON data of all reports")
+    argParser.add_argument("--profile", metavar="PATH", nargs="?", const="profile.json",
+                           help="record the time, bytes and lines of every report into PATH (profile.json by default) "
+                                "and print the summary, see Profiling.py")
+    argParser.add_argument("--cprofile", metavar="PATH", nargs="?", const="profile.prof",
+                           help="capture also the cProfile statistics into PATH (profile.prof by default)")
+    args = argParser.parse_args()
+
+    profile = None
+    if args.profile or args.cprofile:
+        profile = Profiling.start(cprofile=args.cprofile is not None)
+
+    parser = Parser.ReportDirectoryParser(args.directory)
+    parser.load()
+
+    array = parser.array("Net")
+    np.save(args.output, array)
+
+    if args.csv:
+        with open(args.csv, "w") as fptr:
+            # The names and flags hold commas, so they need the quoting of the csv module
+            writer = csv.writer(fptr, lineterminator="\n")
+            writer.writerow(array.dtype.names)
+            writer.writerows(array.tolist())
+
+    if args.json:
+        parser.dump(args.json)
+
+    print "%d reports converted, %d failed" % (len(array), len(parser.errors))
+
+    if profile is not None:
+        Profiling.stop()
+        profile.dump(args.profile or "profile.json")
+        if args.cprofile:
+            profile.saveStats(args.cprofile)
+        profile.summary()
+
+    if parser.errors:
+        sys.exit(1)
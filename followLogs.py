@@ -0,0 +1,52 @@
+"""
+Watch the convergence of running Fluent jobs. Every --interval seconds the logs are polled with Parser.LogFollower,
+which parses only the bytes appended since the previous poll, and one line per job is printed: the iteration,
+the continuity residual and the moving averages of the monitors (Cd-1, Cl-1, ...).
+
+    python followLogs.py /scratch/campaign/*/ --interval 30
+
+The arguments can be case directories (the Parser.FILES["Log"] file is followed) or log files.
+"""
+
+import os
+import time
+import argparse
+
+import Parser
+
+
+def formatSnapshot(name, snapshot):
+    line = "%-30s %8d" % (name[-30:], snapshot["nIteration"])
+    line += " %12.4e" % snapshot["residuals"].get("continuity", float("nan"))
+    for monitor in sorted(snapshot["movingAverage"]):
+        line += "  %s=%.6g" % (monitor, snapshot["movingAverage"][monitor])
+    return line
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Follow the convergence of running Fluent jobs")
+    argParser.add_argument("paths", nargs="+", help="case directories or log files")
+    argParser.add_argument("--interval", type=float, default=30, help="seconds between the polls")
+    argParser.add_argument("--window", type=int, default=250, help="number of iterations of the moving average")
+    argParser.add_argument("--once", action="store_true", help="poll only once and exit")
+    args = argParser.parse_args()
+
+    followers = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            path = os.path.join(path, Parser.FILES["Log"])
+        followers.append(Parser.LogFollower(path, window=args.window))
+
+    while True:
+        print time.strftime("%H:%M:%S") + " %-21s %8s %12s" % ("case", "iter", "continuity")
+        for follower in followers:
+            try:
+                snapshot = follower.poll()
+            except Exception as e:
+                print "%-30s error: %s" % (follower.path[-30:], e)
+                continue
+            print formatSnapshot(os.path.dirname(follower.path) or follower.path, snapshot)
+
+        if args.once:
+            break
+        time.sleep(args.interval)
@@ -36,130 +36,352 @@ The text in the variable looking like number:number:number indicates linear spac
 
   Together with 3 values of "Mach" variable list the total number of generated cases for above example
   would be equal 3 * 11 = 33 cases.
+
+The cases are expanded lazily (itertools.product) and written one at a time, the template is compiled once into
+a format string, so sweeps of tens of thousands of cases need neither the memory nor the open file handles. The
+--dry-run option only prints the number of cases and the estimated size of the journals:
+
+    python journalGenerator.py --dry-run
+
+With --batch N the cases are grouped into batch_0.jou, batch_1.jou, ... journals (run from the campaign directory),
+which read the mesh and set up the solver once and then loop over N cases. The template lines before the first
+TEMPLATE_ variable are the shared setup, the lines up to the exit command are repeated for every case with the output
+files (reports, wc/wd files and the transcript used as the fluent_log.log) placed in the case directory:
+
+    python journalGenerator.py --batch 10
+
+With --warm-start ROOT the cases start from the solution of the nearest already computed case in the ROOT directory
+(in the Mach, DIRX/DIRY/DIRZ space, using its case.json, output.json and .dat file) instead of initialize-flow, and
+their iterations are cut to the --warm-fraction of the iterations the neighbour needed to converge:
+
+    python journalGenerator.py --warm-start . --warm-fraction 0.3 --warm-min-iterations 2000
 """
 
-if __name__ == "__main__":
+import os
+import re
+import json
+import argparse
+import itertools
+import numpy as np
 
-    import json, re, os
+import Parser
 
-    setup = dict()
+linspaceReg = re.compile(r'\b(\S+)\b:\b(\S+)\b:\b(\S+)\b')
 
-    with open("cases.json", 'r') as ptr:
-        setup = json.load(ptr)
+varnameRegex = re.compile(r'\b(TEMPLATE_(\S+))\b')
 
-    linspaceReg = re.compile(r'\b(\S+)\b:\b(\S+)\b:\b(\S+)\b')
 
-    for name in setup:
-        case = setup[name]
-        nvars = []
-        for variable in case:
-            if isinstance(case[variable], list):
-                nvars.append(len(case[variable]))
-            elif isinstance(case[variable], unicode):
-                res = linspaceReg.search(str(case[variable]))
-                if res:
-                    start = float(res.group(1))
-                    step = float(res.group(2))
-                    end = float(res.group(3))
-                    values = []
-                    nvals = int((end-start)/step) + 1
-                    for i in range(nvals):
-                        values.append(start + i*step)
-
-                    case[variable] = values
-                    nvars.append(len(values))
-                else:
-                    nvars.append(1)
-                    case[variable] = [case[variable]]
-            else:
-                nvars.append(1)
-                case[variable] = [case[variable]]
-
-        case["num_cases"] = reduce(lambda a, b: a*b, nvars, 1)
-
-
-    setupExpaned = dict()
+def expandValue(value):
+    """
+    Returns the list of values of the variable: lists are taken as they are, "start:step:end" strings are
+    translated to the linear space and single values to the single element lists
+    """
+    if isinstance(value, list):
+        return value
+
+    if isinstance(value, unicode):
+        res = linspaceReg.search(str(value))
+        if res:
+            start = float(res.group(1))
+            step = float(res.group(2))
+            end = float(res.group(3))
+            nvals = int((end-start)/step) + 1
+            return [start + i*step for i in range(nvals)]
+
+    return [value]
+
+
+def countCases(group):
+    return reduce(lambda a, b: a*b, [len(expandValue(group[variable])) for variable in group], 1)
+
+
+def expandGroup(name, group):
+    """
+    Generator of (case name, case variables) of the single group. The last variable changes the fastest.
+    """
+    varNames = list(group)
+    values = [expandValue(group[varname]) for varname in varNames]
 
+    if countCases(group) == 1:
+        yield name, {varname: values[i][0] for i, varname in enumerate(varNames)}
+        return
+
+    for caseId, combination in enumerate(itertools.product(*values)):
+        yield name + "_" + str(caseId), dict(zip(varNames, combination))
+
+
+def expandCases(setup):
     for name in setup:
+        for case in expandGroup(name, setup[name]):
+            yield case
 
-        if setup[name]["num_cases"] == 1:
-            setupExpaned[name] = dict()
-            for varname in setup[name]:
-                if varname != "num_cases":
-                    setupExpaned[name][varname] = setup[name][varname][0] #convert created lists to single values
-            continue
 
-        ncases = setup[name]["num_cases"]
+def compileText(text):
+    """
+    Compiles the template text into the format string with %(name)s fields in place of the TEMPLATE_name variables.
+    Returns (format string, set of variable names).
+    """
+    variables = set()
 
-        for num in range(setup[name]["num_cases"]):
-                newName = name + "_" + str(num)
-                setupExpaned[newName] = dict()
+    parts = varnameRegex.split(text)
+    # split returns literal text followed by the two groups of each match
+    plan = ""
+    for i in range(0, len(parts), 3):
+        plan += parts[i].replace("%", "%%")
+        if i + 2 < len(parts):
+            variables.add(parts[i + 2])
+            plan += "%(" + parts[i + 2] + ")s"
 
+    return plan, variables
 
-        # Now generate loops in the loops inside single while :)
-        varNames = [varname for varname in setup[name] if varname != "num_cases"]
-        levelNames = {i: varname for i, varname in enumerate(varNames)}
-        levelPosition = [0 for i in range(len(varNames))]
-        levelMaxPositions = [len(setup[name][varname]) for varname in varNames]
-        caseId = 0
-        level = 0
-        endLevel = len(varNames)
-        while caseId < ncases:
-            caseName = name + "_" + str(caseId)
-            setupExpaned[caseName][levelNames[level]] = setup[name][levelNames[level]][levelPosition[level]]
 
-            if level == endLevel-1:
-                levelPosition[level] += 1
+def compileTemplate(path):
+    with open(path, 'r') as template:
+        return compileText(template.read())
 
-            if levelPosition[level] == levelMaxPositions[level]: # and level > 0 it should never happend due to while limit
 
-                toDecrease = level-1
+quotedNameRegex = re.compile(r'"([^"%/]+)"')
 
-                while toDecrease > 0:
-                    if levelPosition[toDecrease] + 1 < levelMaxPositions[toDecrease]:
-                        levelPosition[toDecrease] += 1
-                        toDecrease = 0
-                    else:
-                        levelPosition[toDecrease] = 0
-                        toDecrease -= 1
+writeCommandRegex = re.compile(r'^(\s*/?(?:file/)?(?:wc|wd|write-case|write-data)\s+)(\S+)', re.MULTILINE)
 
-                levelPosition[level] = 0
+exitRegex = re.compile(r'^\s*/?exit\b')
 
-            level += 1
-            if level == endLevel:
-                caseId += 1
-                level = 0
 
-    setup = setupExpaned
+def compileBatchTemplate(path):
+    """
+    Splits the template into the setup (lines before the first TEMPLATE_ variable, e.g. read-case and the solver
+    settings), the case section (up to the exit command) and the closing lines, and compiles them. The file names in
+    the case section (quoted report names and the wc/wd files) are prefixed with the case directory and the section
+    is wrapped in the transcript written to the case directory, so each case gets the files expected by the
+    postprocessing. Returns (setup plan, case plan, closing plan, set of variable names).
+    """
+    with open(path, 'r') as template:
+        lines = template.readlines()
+
+    first = next((i for i, line in enumerate(lines) if varnameRegex.search(line)), None)
+    if first is None:
+        raise Exception("The template " + path + " has no TEMPLATE_ variables, there is nothing to batch")
+    last = next((i for i in range(len(lines) - 1, first - 1, -1) if exitRegex.match(lines[i])), len(lines))
+
+    setupPlan = "".join(lines[:first]).replace("%", "%%")
+    casePlan, variables = compileText("".join(lines[first:last]))
+    closingPlan = "".join(lines[last:]).replace("%", "%%")
+
+    casePlan = quotedNameRegex.sub(r'"%(__case__)s/\1"', casePlan)
+    casePlan = writeCommandRegex.sub(r'\1%(__case__)s/\2', casePlan)
+    if not casePlan.endswith("\n"):
+        casePlan += "\n"
+    casePlan = ("/file/start-transcript \"%(__case__)s/" + Parser.FILES["Log"] + "\"\n" + casePlan +
+                "/file/stop-transcript\n")
+
+    return setupPlan, casePlan, closingPlan, variables
 
-    #make directories:
-    for name in setup:
-        if not os.path.exists(name):
-            os.makedirs(name)
 
-    #Fill journal files
-    files = {name: open(name+os.sep+name+".jou", 'w') for name in setup}
+def renderJournal(plan, case, name=None):
+    values = {varname: str(case[varname]) for varname in case}
+    values["__case__"] = name
+    return plan % values
 
-    #Dump json setup:
+
+def checkVariables(setup, variables):
+    for name in setup:
+        missing = variables.difference(setup[name])
+        if missing:
+            raise Exception("The template variables " + ", ".join(sorted(missing)) + " are not defined in the " +
+                            name + " group")
+
+
+initializeRegex = re.compile(r'^\s*/?solve/initialize/initialize-flow\s*$', re.MULTILINE)
+
+iterateRegex = re.compile(r'^(\s*/?solve/iterate\s+)(\d+)', re.MULTILINE)
+
+
+def casePoint(case):
+    """
+    Position of the case in the (Mach, flow direction) space, the direction is normalized as Fluent does it
+    """
+    direction = np.array([float(case["DIRX"]), float(case["DIRY"]), float(case["DIRZ"])])
+    length = np.linalg.norm(direction)
+    if length > 0:
+        direction /= length
+    return [float(case["Mach"])] + direction.tolist()
+
+
+class WarmStart:
+    """
+    Index of the already postprocessed cases (directories with case.json, output.json and the .dat file) in the
+    (Mach, DIRX, DIRY, DIRZ) space. The journal of the new case reads the .dat file of the nearest case instead of
+    initializing the flow, and its iterations are cut to the fraction of the iterations the neighbour needed to
+    converge, but not below minIterations nor above the template value. The nIteration of the log counts also the
+    iterations of the .dat file the neighbour started from, so the warm started case records that start in its
+    case.json as "startIteration" and only the difference is used. Cases farther than maxDistance start from the
+    scratch.
+    """
+    def __init__(self, root, fraction=0.5, minIterations=1000, maxDistance=None):
+        self.fraction = fraction
+        self.minIterations = minIterations
+        self.maxDistance = maxDistance
+
+        self.dataFiles = []
+        # The final iteration counter and the iterations run by the neighbour
+        self.finalIterations = []
+        self.iterations = []
+        points = []
+
+        for name in sorted(os.listdir(root)):
+            directory = os.path.join(root, name)
+            try:
+                with open(directory+os.sep+"case.json", 'r') as f:
+                    case = json.load(f)
+                with open(directory+os.sep+"output.json", 'r') as f:
+                    nIteration = json.load(f).get("Log", dict()).get("nIteration")
+                point = casePoint(case)
+            except (IOError, OSError, ValueError, KeyError, TypeError):
+                continue
+
+            dataFiles = sorted(f for f in os.listdir(directory) if f.endswith(".dat") or f.endswith(".dat.gz"))
+            if not nIteration or not dataFiles:
+                continue
+
+            points.append(point)
+            self.dataFiles.append(directory+os.sep+dataFiles[-1])
+            self.finalIterations.append(nIteration)
+            self.iterations.append(nIteration - case.get("startIteration", 0))
+
+        self.points = np.array(points, dtype=float).reshape(-1, 4)
+
+        print "Warm start: %d converged cases found in %s" % (len(self.dataFiles), root)
+
+    def nearest(self, case):
+        """
+        Returns the index of the nearest case or None
+        """
+        if len(self.points) == 0:
+            return None
+
+        distances = np.sqrt(((self.points - casePoint(case)) ** 2).sum(axis=1))
+        i = int(np.argmin(distances))
+        if self.maxDistance is not None and distances[i] > self.maxDistance:
+            return None
+        return i
+
+    def apply(self, journal, case, directory="."):
+        """
+        Rewrites the rendered journal to start from the nearest case, the data file path is relative to the directory
+        the journal is run from. Sets "startIteration" of the case, write its case.json afterwards.
+        """
+        i = self.nearest(case)
+        if i is None:
+            return journal
+
+        case["startIteration"] = self.finalIterations[i]
+        budget = max(self.minIterations, int(np.ceil(self.fraction * self.iterations[i])))
+
+        journal = initializeRegex.sub('/file/read-data "%s"' % os.path.relpath(self.dataFiles[i], directory), journal)
+        return iterateRegex.sub(lambda match: match.group(1) + str(min(int(match.group(2)), budget)), journal)
+
+
+def writeCase(name, case, plan, warmStart=None):
+    journal = renderJournal(plan, case)
+    if warmStart is not None:
+        journal = warmStart.apply(journal, case, name)
+
+    writeCaseSetup(name, case)
+
+    with open(name+os.sep+name+".jou", 'w') as f:
+        f.write(journal)
+
+
+def writeCaseSetup(name, case):
+    if not os.path.exists(name):
+        os.makedirs(name)
+
+    with open(name+os.sep+"case.json", 'w') as f:
+        json.dump(case, f, indent=4)
+
+
+def writeBatches(cases, batchSize, setupPlan, casePlan, closingPlan, warmStart=None):
+    """
+    Writes the batch_N.jou journals, each running batchSize cases in the single Fluent session, which reads the mesh
+    and sets up the solver once. The journals are run from the current directory.
+    """
+    cases = iter(cases)
+    batchId = 0
+    while True:
+        batch = list(itertools.islice(cases, batchSize))
+        if not batch:
+            break
+
+        with open("batch_%d.jou" % batchId, 'w') as f:
+            f.write(setupPlan % dict())
+            for name, case in batch:
+                journal = renderJournal(casePlan, case, name)
+                if warmStart is not None:
+                    journal = warmStart.apply(journal, case)
+                writeCaseSetup(name, case)
+                f.write(journal)
+            f.write(closingPlan % dict())
+
+        print "batch_%d.jou: " % batchId + ", ".join(name for name, case in batch)
+        batchId += 1
+
+
+def estimate(setup, plan):
+    """
+    Returns the list of (group name, number of cases, estimated journal bytes), the size is estimated from the first
+    case of the group
+    """
+    estimates = []
     for name in setup:
-        with open(name+os.sep+"case.json", 'w') as f:
-            json.dump(setup[name], f, indent=4)
-
-    varnameRegex = re.compile(r'\b(TEMPLATE_(\S+))\b')
-
-    with open("template.jou", 'r') as template:
-        for line in template.readlines():
-            res = varnameRegex.findall(line)
-            if len(res) > 0:
-                for case in setup:
-                    toWrite = line
-                    for var in res:
-                        value = setup[case][var[1]]
-                        toWrite = re.sub(var[0], str(value), toWrite)
-                    files[case].write(toWrite)
-            else:
-                for f in files.values():
-                    f.write(line)
-
-    for f in files.values():
-        f.close()
+        firstName, firstCase = next(expandGroup(name, setup[name]))
+        nCases = countCases(setup[name])
+        estimates.append((name, nCases, nCases * len(renderJournal(plan, firstCase, firstName))))
+    return estimates
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Generate Fluent case journals from the template")
+    argParser.add_argument("--cases", default="cases.json", help="cases definition")
+    argParser.add_argument("--template", default="template.jou", help="journal template")
+    argParser.add_argument("--dry-run", action="store_true",
+                           help="only print the number of cases and the estimated size of the journals")
+    argParser.add_argument("--batch", type=int, metavar="N",
+                           help="write batch_*.jou journals running N cases each in the single Fluent session")
+    argParser.add_argument("--warm-start", metavar="ROOT",
+                           help="start the cases from the nearest converged case found in the ROOT directory")
+    argParser.add_argument("--warm-fraction", type=float, default=0.5,
+                           help="iterations of the warm started case as the fraction of the neighbour iterations")
+    argParser.add_argument("--warm-min-iterations", type=int, default=1000,
+                           help="the lowest number of iterations of the warm started case")
+    argParser.add_argument("--warm-max-distance", type=float,
+                           help="cases without the neighbour closer than this distance start from the scratch")
+    args = argParser.parse_args()
+
+    with open(args.cases, 'r') as ptr:
+        setup = json.load(ptr)
+
+    if args.batch:
+        setupPlan, plan, closingPlan, variables = compileBatchTemplate(args.template)
+    else:
+        plan, variables = compileTemplate(args.template)
+    checkVariables(setup, variables)
+
+    if args.dry_run:
+        estimates = estimate(setup, plan)
+        for name, nCases, nBytes in estimates:
+            print "%-30s %10d cases %12.1f MB" % (name, nCases, nBytes / 1024.0 ** 2)
+        print "%-30s %10d cases %12.1f MB" % ("total", sum(e[1] for e in estimates),
+                                               sum(e[2] for e in estimates) / 1024.0 ** 2)
+        if args.batch:
+            nCases = sum(e[1] for e in estimates)
+            print "%d batch journals of up to %d cases" % ((nCases + args.batch - 1) / args.batch, args.batch)
+    else:
+        warmStart = None
+        if args.warm_start:
+            warmStart = WarmStart(args.warm_start, args.warm_fraction, args.warm_min_iterations, args.warm_max_distance)
+
+        if args.batch:
+            writeBatches(expandCases(setup), args.batch, setupPlan, plan, closingPlan, warmStart)
+        else:
+            for name, case in expandCases(setup):
+                writeCase(name, case, plan, warmStart)
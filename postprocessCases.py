@@ -1,48 +1,308 @@
+"""
+Postprocess all case directories found in the campaign directory (by default "specification"). Each directory which
+contains all Parser.FILES gets its own output.json, and the data of all cases is collected into output.json and
+output.csv in the campaign directory.
 
+Each case directory gets a manifest (see Cache.py) and on the next run the cases whose input files did not change are
+served from it, unless --force is given.
 
-if __name__ == "__main__":
-    import Parser
-    import os, json
+The cases can be spread across the multiprocessing pool workers:
+
+    python postprocessCases.py specification --processes 36
+
+With --per-file the single files (the log and force reports) are distributed instead of whole directories, what keeps
+the workers busy even when there are only a few cases. With --prefetch the single process reads the files of the
+next cases by the background threads while parsing the current one, what hides the latency of the network
+filesystems. The results are always merged in the order of the sorted directory names. Errors of single cases are
+reported at the end and don't abort the run.
+
+The root can be also the tar or zip archive of the case directories, which is then read in one pass without
+extracting it (see Archive.py), the outputs are written next to it as <archive>.output.json and <archive>.output.csv.
+
+    python postprocessCases.py /scratch/batch_1.tar.gz
+
+With --catalog the cases are also indexed in the SQLite catalog (see Catalog.py) for fast queries.
 
-    os.chdir("specification")
+With --profile the time, bytes, lines and opened files of every parser and case are written to profile.json and
+summarized at the end (see Profiling.py), --cprofile adds the cProfile statistics. The profiled run uses the single
+process.
 
-    #find right directories:
-    dirsToProcess = []
-    for path in os.listdir("."):
-        if os.path.isdir(path):
-            files = os.listdir(path)
+The cases are streamed through discover -> parse -> project -> write: the JSON member and the CSV row of each case
+are written as soon as the case is parsed, so the memory use stays flat regardless of the campaign size.
+"""
+
+import os
+import json
+import argparse
+import functools
+import multiprocessing
+from collections import OrderedDict
+
+import Parser
+import Cache
+import Profiling
+import Store
+import Catalog
+import Archive
+
+
+def discoverCases(root="."):
+    """
+    Generator of the case directories in the root, which contain all files required for postprocessing
+    """
+    for path in sorted(os.listdir(root)):
+        fullPath = os.path.join(root, path)
+        if os.path.isdir(fullPath):
             ok = True
             for f in Parser.FILES.values():
-                is_file_ok = f in files
+                # Compressed versions (FX.gz, fluent_log.log.xz, ...) are accepted as well
+                is_file_ok = os.path.exists(Parser.resolvePath(os.path.join(fullPath, f)))
                 ok *= is_file_ok
             if ok:
-                dirsToProcess.append(path)
-                print "Accepting "+path
+                print "Accepting " + path
+                yield fullPath
             else:
-                print "WARNING! omitting directory "+path+" because there are missing files for proper postprocessing"
+                print "WARNING! omitting directory " + path + " because there are missing files for proper postprocessing"
+
+
+def findCaseDirectories(root="."):
+    return list(discoverCases(root))
+
+
+def loadCase(directory, cache=True, useHash=False, contents=None):
+    """
+    Parses and dumps the single case directory, returns (directory, data, errors). Used by the pool workers.
+    The contents are the files already read by the Parser.Prefetcher.
+    """
+    parser = Parser.DirectoryParser(directory)
+    caseCache = Cache.CaseCache(directory, useHash)
+    try:
+        with Profiling.CaseTimer(directory):
+            if contents is None:
+                states = caseCache.inputStates() if cache else None
+                parser.load()
+            else:
+                states = caseCache.statesFrom(contents) if cache else None
+                parser.loadFrom(contents)
+            parser.dump(directory + os.sep + "output.json")
+            if cache:
+                caseCache.store(parser.data, parser.errors, states)
+    except Exception as e:
+        parser.errors.append("Case " + directory + " error.\n" + str(e))
+
+    return directory, parser.data, parser.errors
+
+
+def parseCases(directories, processes=1, perFile=False, cache=True, useHash=False, prefetch=0):
+    """
+    Generator of (directory, data, errors) tuples in the order of given directories. With prefetch > 0 and single
+    process the files are read ahead by that many threads (see Parser.Prefetcher) while the parsing goes on.
+    """
+    if processes <= 1:
+        if prefetch > 0:
+            for directory, contents in Parser.Prefetcher(directories, prefetch):
+                yield loadCase(directory, cache, useHash, contents)
+            return
+
+        for directory in directories:
+            yield loadCase(directory, cache, useHash)
+        return
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        if not perFile:
+            for result in pool.imap(functools.partial(loadCase, cache=cache, useHash=useHash), directories):
+                yield result
+        else:
+            parsers = [Parser.DirectoryParser(directory) for directory in directories]
+            caches = [Cache.CaseCache(directory, useHash) for directory in directories]
+            states = [caseCache.inputStates() if cache else None for caseCache in caches]
+            tasks = [task for parser in parsers for task in parser.tasks()]
+            results = pool.imap(Parser.parseFile, tasks, chunksize=len(Parser.FILES))
+
+            for parser, caseCache, caseStates in zip(parsers, caches, states):
+                parser.collect([results.next() for i in range(len(parser.tasks()))])
+                try:
+                    parser.dump(parser.directory + os.sep + "output.json")
+                    if cache:
+                        caseCache.store(parser.data, parser.errors, caseStates)
+                except Exception as e:
+                    parser.errors.append("Case " + parser.directory + " error.\n" + str(e))
+                yield parser.directory, parser.data, parser.errors
+    finally:
+        pool.close()
+        pool.join()
+
+
+def loadCases(directories, processes=1, perFile=False, cache=True, useHash=False, force=False, prefetch=0):
+    """
+    Same as parseCases, but the directories with unchanged input files are served from the manifest cache
+    (see Cache.py) and only the remaining ones are parsed. With force=True all directories are parsed again.
+    Only the small state sidecars are read up front and the names of the cached directories are kept, the data of each
+    manifest is decoded once when its turn comes, so the memory use doesn't depend on the number of cases.
+    """
+    directories = list(directories)
+
+    cached = set()
+    if cache and not force:
+        for directory in directories:
+            if Cache.CaseCache(directory, useHash).isValid():
+                cached.add(directory)
+
+    if cached:
+        print "%d of %d cases unchanged, served from the cache" % (len(cached), len(directories))
+
+    results = parseCases([directory for directory in directories if directory not in cached],
+                         processes, perFile, cache, useHash, prefetch)
+
+    for directory in directories:
+        result = Cache.CaseCache(directory, useHash).load() if directory in cached else None
+        if result is None:
+            # Not cached or changed in the meantime
+            if directory in cached:
+                result = loadCase(directory, cache, useHash)
+            else:
+                result = results.next()
+            yield result
+            continue
+
+        data, errors = result
+        outputFile = directory + os.sep + "output.json"
+        if not os.path.exists(outputFile):
+            with open(outputFile, 'w') as fptr:
+                json.dump(data, fptr, indent=4, default=Parser.plainData)
+        yield directory, data, errors
+
+
+def projectRows(cases, failed, componentName="Net"):
+    """
+    Generator of (directory, data, titles, row) with the Data.table row of each case, the row is None when
+    the table can't be built. The errors are collected in failed dictionary: case name -> list of errors.
+    """
+    for directory, data, errors in cases:
+        name = os.path.basename(directory)
+        if errors:
+            failed[name] = list(errors)
+
+        titles, row = None, None
+        try:
+            titles, row = Parser.Data(data).table(componentName)
+        except Exception as e:
+            failed.setdefault(name, []).append("Table error, missing " + str(e))
+
+        yield directory, data, titles, row
+
+
+class DumpedCases:
+    """
+    Read-only mapping: case name -> data, which loads the data from the case output.json on each access.
+    Lets the Store.writeStore go through the whole campaign without holding it in memory.
+    """
+    def __init__(self, directories):
+        self.directories = OrderedDict((os.path.basename(directory), directory) for directory in directories)
+
+    def __iter__(self):
+        return iter(self.directories)
+
+    def __len__(self):
+        return len(self.directories)
+
+    def __getitem__(self, name):
+        with open(self.directories[name] + os.sep + "output.json", "r") as fptr:
+            return json.load(fptr)
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Postprocess all Fluent case directories from the campaign directory")
+    argParser.add_argument("root", nargs="?", default="specification", help="campaign directory or archive")
+    argParser.add_argument("-j", "--processes", type=int, default=1,
+                           help="number of worker processes, 0 means number of cores")
+    argParser.add_argument("--per-file", action="store_true",
+                           help="distribute single files instead of whole case directories across the workers")
+    argParser.add_argument("--force", action="store_true",
+                           help="parse all cases again, even if their inputs did not change since the last run")
+    argParser.add_argument("--hash", action="store_true",
+                           help="detect changed inputs by the content hash in addition to size and modification time")
+    argParser.add_argument("--no-cache", action="store_true", help="neither read nor write the per case manifests")
+    argParser.add_argument("--prefetch", type=int, default=0, metavar="THREADS",
+                           help="read the files of the next cases ahead by THREADS threads while parsing, hides the "
+                                "network filesystem latency when running in the single process. The files of the "
+                                "2 cases read ahead stay in memory, so the peak memory grows with the case size")
+    argParser.add_argument("--store", metavar="PATH",
+                           help="write also the columnar binary store (see Store.py) into the PATH directory")
+    argParser.add_argument("--catalog", metavar="PATH", nargs="?", const=Catalog.CATALOG,
+                           help="update also the SQLite case catalog (see Catalog.py), " + Catalog.CATALOG + " by default")
+    argParser.add_argument("--profile", metavar="PATH", nargs="?", const="profile.json",
+                           help="record the time, bytes and lines of every parser and case into PATH "
+                                "(profile.json by default) and print the summary, runs in the single process")
+    argParser.add_argument("--cprofile", metavar="PATH", nargs="?", const="profile.prof",
+                           help="capture also the cProfile statistics into PATH (profile.prof by default)")
+    args = argParser.parse_args()
+
+    processes = args.processes if args.processes > 0 else multiprocessing.cpu_count()
+
+    profile = None
+    if args.profile or args.cprofile:
+        # The records are collected only in this process
+        processes = 1
+        profile = Profiling.start(cprofile=args.cprofile is not None)
+        args.profile = os.path.abspath(args.profile or "profile.json")
+        if args.cprofile:
+            args.cprofile = os.path.abspath(args.cprofile)
+
+    # Pipeline: discover -> parse -> project -> write, every case is written as soon as it is parsed
+    archived = None
+    if Archive.isArchive(args.root):
+        # Nothing is extracted, the outputs are written next to the archive
+        os.chdir(os.path.dirname(os.path.abspath(args.root)))
+        archiveName = os.path.basename(args.root)
+        outputName = archiveName + ".output"
+        cases = ((parser.directory, parser.data, parser.errors) for parser in Archive.loadArchiveCases(archiveName))
+        archived = OrderedDict()
+    else:
+        os.chdir(args.root)
+        outputName = "output"
+        cases = loadCases(discoverCases("."), processes, args.per_file, not args.no_cache, args.hash, args.force,
+                          args.prefetch)
+
+    failed = OrderedDict()
+    written = []
+    catalog = Catalog.Catalog(args.catalog) if args.catalog else None
+    with open(outputName + ".json", 'w') as jsonFile, open(outputName + ".csv", 'w') as csvFile:
+        jsonWriter = Parser.JSONObjectWriter(jsonFile)
+        csvWriter = Parser.CSVWriter(csvFile)
 
-    # parse files, dump json version, collect data
-    allDics = dict()
-    for directory in dirsToProcess:
-        parser = Parser.DirectoryParser(directory)
-        parser.load()
-        parser.dump(directory + os.sep + "output.json")
-        allDics[os.path.basename(directory)] = parser.data
+        for directory, data, titles, row in projectRows(cases, failed):
+            jsonWriter.write(os.path.basename(directory), data)
+            written.append(directory)
+            if archived is not None and args.store:
+                # The archived cases have no output.json to read back from
+                archived[os.path.basename(directory)] = data
+            if catalog is not None:
+                catalog.add(os.path.basename(directory), data)
 
+            if row is not None:
+                if csvWriter.titles is None:
+                    csvWriter.writeTitles(titles)
+                csvWriter.writeRow(row)
 
+        jsonWriter.close()
+        csvWriter.flush()
 
-    #Dump json for all data in single location:
-    with open("output.json", 'w') as f:
-        json.dump(allDics, f, indent=4)
+    if catalog is not None:
+        catalog.close()
 
-    # write CSV report
-    colTitles = ""
-    rows = []
-    for dataName in allDics:
-        data = allDics[dataName]
-        colTitles, row = Parser.Data(data).table("Net")
-        rows.append(row)
+    if args.store:
+        Store.writeStore(args.store, archived if archived is not None else DumpedCases(written))
 
-    with open("output.csv", 'w') as fptr:
-        Parser.writeCSV(fptr, colTitles, rows)
+    if failed:
+        print "\n%d of %d cases reported errors:" % (len(failed), len(written))
+        for name in failed:
+            print name + ":\n    " + "\n    ".join(error.strip().replace("\n", " ") for error in failed[name])
 
+    if profile is not None:
+        Profiling.stop()
+        profile.dump(args.profile)
+        if args.cprofile:
+            profile.saveStats(args.cprofile)
+        profile.summary()
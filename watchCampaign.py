@@ -0,0 +1,162 @@
+"""
+Resident postprocessing of the running campaign. The campaign directory is polled every --interval seconds and each
+case directory is ingested as soon as it is complete: all Parser.FILES exist (also compressed) and the log ends with
+the "> exit" command, or with the stop-transcript command closing the case of the batch journal (see
+journalGenerator.py --batch). The new cases are parsed right away (see postprocessCases.loadCases) and appended to the
+aggregated output.json and output.csv of the campaign, and to the catalog with --catalog:
+
+    python watchCampaign.py specification --interval 60 --catalog
+
+On the start all cases which are complete already are ingested, unchanged ones are served from their manifests
+(see Cache.py), so restarting the watcher is cheap. The aggregated output.json is valid JSON after every poll.
+"""
+
+import os
+import re
+import time
+import argparse
+
+import Parser
+import Catalog
+import postprocessCases
+
+
+# The last line of the finished log: the exit of the single case journal, or the end of the case transcript in the
+# batch journal, echoed with or without the prompt
+finishedRegex = re.compile(r'^(>\s*exit|(>\s*)?/?(file/)?stop-transcript)$')
+
+
+def logFinished(path):
+    """
+    True when the last command in the log is "> exit", i.e. Fluent finished the journal, or the stop-transcript, i.e.
+    Fluent finished the case of the batch journal
+    """
+    for line in Parser.ropen(path):
+        if line.strip():
+            return finishedRegex.match(line.strip()) is not None
+    return False
+
+
+class CampaignWatcher:
+    def __init__(self, root, catalogPath=None, processes=1, useHash=False, prefetch=0):
+        self.root = root
+        self.processes = processes
+        self.useHash = useHash
+        self.prefetch = prefetch
+
+        self.ingested = set()
+        # Case directory -> (size, mtime) of the unfinished log, it is read again only when it changes
+        self.unfinished = dict()
+        self.failed = dict()
+
+        self.jsonFile = open(os.path.join(root, "output.json"), "w+")
+        self.csvFile = open(os.path.join(root, "output.csv"), "w")
+        self.jsonWriter = Parser.JSONObjectWriter(self.jsonFile)
+        self.csvWriter = Parser.CSVWriter(self.csvFile)
+        self.jsonWriter.checkpoint()
+
+        self.catalog = Catalog.Catalog(os.path.join(root, catalogPath)) if catalogPath else None
+
+    def isComplete(self, directory):
+        for name in Parser.FILES:
+            if not os.path.exists(Parser.resolvePath(directory + os.sep + Parser.FILES[name])):
+                return False
+
+        logPath = Parser.resolvePath(directory + os.sep + Parser.FILES["Log"])
+        stat = os.stat(logPath)
+        if self.unfinished.get(directory) == (stat.st_size, stat.st_mtime):
+            return False
+
+        if logFinished(logPath):
+            self.unfinished.pop(directory, None)
+            return True
+        self.unfinished[directory] = (stat.st_size, stat.st_mtime)
+        return False
+
+    def completeCases(self):
+        """
+        Returns the sorted list of complete case directories, which were not ingested yet
+        """
+        directories = []
+        for name in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, name)
+            if directory in self.ingested or not os.path.isdir(directory):
+                continue
+            try:
+                if self.isComplete(directory):
+                    directories.append(directory)
+            except (IOError, OSError):
+                # The files are being moved or written right now, try it on the next poll
+                continue
+        return directories
+
+    def poll(self):
+        """
+        Ingests the newly completed cases, returns their number
+        """
+        directories = self.completeCases()
+        if not directories:
+            return 0
+
+        failed = dict()
+        cases = postprocessCases.loadCases(directories, self.processes, useHash=self.useHash, prefetch=self.prefetch)
+        for directory, data, titles, row in postprocessCases.projectRows(cases, failed):
+            name = os.path.basename(directory)
+            self.jsonWriter.write(name, data)
+            if self.catalog is not None:
+                self.catalog.add(name, data)
+
+            if row is not None:
+                if self.csvWriter.titles is None:
+                    self.csvWriter.writeTitles(titles)
+                self.csvWriter.writeRow(row)
+            self.ingested.add(directory)
+
+        self.jsonWriter.checkpoint()
+        self.csvWriter.flush()
+        self.csvFile.flush()
+        if self.catalog is not None:
+            self.catalog.commit()
+
+        for name in sorted(failed):
+            print name + ":\n    " + "\n    ".join(error.strip().replace("\n", " ") for error in failed[name])
+        self.failed.update(failed)
+
+        return len(directories)
+
+    def close(self):
+        self.jsonFile.close()
+        self.csvFile.close()
+        if self.catalog is not None:
+            self.catalog.close()
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Postprocess the campaign cases as soon as their jobs finish")
+    argParser.add_argument("root", nargs="?", default="specification", help="campaign directory")
+    argParser.add_argument("--interval", type=float, default=60, help="seconds between the polls")
+    argParser.add_argument("-j", "--processes", type=int, default=1, help="number of worker processes")
+    argParser.add_argument("--hash", action="store_true",
+                           help="detect changed inputs by the content hash in addition to size and modification time")
+    argParser.add_argument("--prefetch", type=int, default=0, metavar="THREADS",
+                           help="read the files of the next cases ahead by THREADS threads while parsing, the files "
+                                "of the 2 cases read ahead stay in memory, so the peak memory grows with the case size")
+    argParser.add_argument("--catalog", metavar="PATH", nargs="?", const=Catalog.CATALOG,
+                           help="update also the SQLite case catalog (see Catalog.py), " + Catalog.CATALOG + " by default")
+    argParser.add_argument("--once", action="store_true", help="poll only once and exit")
+    args = argParser.parse_args()
+
+    watcher = CampaignWatcher(args.root, args.catalog, args.processes, args.hash, args.prefetch)
+    try:
+        while True:
+            count = watcher.poll()
+            if count:
+                print time.strftime("%H:%M:%S") + " %d cases ingested, %d in total, %d with errors" \
+                      % (count, len(watcher.ingested), len(watcher.failed))
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()